@@ -0,0 +1,111 @@
+from typing import NamedTuple, Iterator
+from functools import partial
+from multiprocessing import Pool
+from random import Random
+from time import perf_counter
+from game import Minesweeper
+from bitgame import BitMinesweeper
+from sparsegame import SparseMinesweeper
+from remote import GameConnection, RemoteMinesweeper
+from simpleagent import SimpleAgent
+from setagent import SetAgent
+from linearagent import LinearAgent
+from bitagent import BitSimpleAgent, BitSetAgent, BitLinearAgent
+from probability import ProbabilityEngine
+from patterncache import PatternCache
+
+
+GAMES = {"set": Minesweeper, "bit": BitMinesweeper, "sparse": SparseMinesweeper}
+AGENTS = {
+    "set": {"simple": SimpleAgent, "set": SetAgent, "linear": LinearAgent},
+    "bit": {"simple": BitSimpleAgent, "set": BitSetAgent, "linear": BitLinearAgent},
+    "sparse": {"simple": SimpleAgent, "set": SetAgent, "linear": LinearAgent},
+}
+
+
+class GameSpec(NamedTuple):
+    rows: int
+    columns: int
+    mines: int
+    agent: str = "set"
+    backend: str = "set"
+    first_safe: bool = False
+    exact_guess: bool = False
+    guess_time: float = None
+    guess_cells: int = None
+    pattern_cache: int = None
+    # the address of a GameServer to play on rather than in this process
+    server: str = None
+
+
+def game_seeds(board_seed: int, agent_seed: int, index: int) -> tuple[int, int]:
+    # derived from the global seeds and the game's index alone, so a game plays out the same
+    # no matter which worker it lands on or what that worker played before it
+    return Random(f"{board_seed}:{index}").getrandbits(64), Random(f"{agent_seed}:{index}").getrandbits(64)
+
+
+def make_game(spec: GameSpec, seed=None) -> Minesweeper:
+    if spec.server:
+        return RemoteMinesweeper(GameConnection(spec.server), spec.rows, spec.columns, spec.mines, seed,
+                                 first_safe=spec.first_safe)
+    return GAMES[spec.backend](spec.rows, spec.columns, spec.mines, seed, first_safe=spec.first_safe)
+
+
+def make_agent(spec: GameSpec, game: Minesweeper, seed=None) -> SimpleAgent:
+    options = {}
+    if spec.exact_guess and spec.agent != "simple":
+        options["probability"] = ProbabilityEngine(spec.guess_time, spec.guess_cells)
+    if spec.pattern_cache:
+        options["patterns"] = PatternCache(spec.pattern_cache)
+    return AGENTS[spec.backend][spec.agent](game, seed=seed, **options)
+
+
+# each worker process keeps one game and agent per spec, as building a board's lookup tables costs more than a reset
+_players: dict[GameSpec, tuple[Minesweeper, SimpleAgent]] = {}
+
+
+def player(spec: GameSpec) -> tuple[Minesweeper, SimpleAgent]:
+    if spec not in _players:
+        game = make_game(spec)
+        _players[spec] = game, make_agent(spec, game)
+    return _players[spec]
+
+
+def play_game(spec: GameSpec, board_seed: int, agent_seed: int, index: int) -> dict:
+    game, agent = player(spec)
+    game_board_seed, game_agent_seed = game_seeds(board_seed, agent_seed, index)
+    game.random.seed(game_board_seed)
+    agent.random.seed(game_agent_seed)
+    start = perf_counter()
+    game.reset()
+    agent.play()
+    return {
+        "game": index,
+        "board_seed": game_board_seed,
+        "agent_seed": game_agent_seed,
+        "rows": spec.rows,
+        "columns": spec.columns,
+        "mines": spec.mines,
+        "won": game.winning_state(),
+        "moves": agent.moves,
+        "guesses": agent.guesses,
+        "duration": perf_counter() - start,
+    }
+
+
+def play_games(spec: GameSpec, board_seed: int, agent_seed: int, indices: Iterator[int], workers: int = None,
+               pool: Pool = None) -> Iterator[dict]:
+    """
+    Plays a game for each index across a pool of worker processes, or in this process if there's only one worker,
+    yielding a result for each in whichever order they finish. A pool can be passed in to be used rather than
+    starting a new one, so the workers and the games they've built are kept between calls.
+    """
+    play = partial(play_game, spec, board_seed, agent_seed)
+    if pool is not None:
+        yield from pool.imap_unordered(play, indices, chunksize=16)
+        return
+    if workers == 1:
+        yield from map(play, indices)
+        return
+    with Pool(workers) as pool:
+        yield from pool.imap_unordered(play, indices, chunksize=16)
@@ -0,0 +1,202 @@
+from batch import GameSpec, make_game, make_agent
+from time import perf_counter
+from typing import Callable
+import argparse
+import json
+import platform
+import sys
+
+
+# name: rows, columns, mines
+BOARDS = {
+    "beginner": (9, 9, 10),
+    "intermediate": (16, 16, 40),
+    "expert": (16, 30, 99),
+    "large": (50, 50, 400),
+    "huge": (100, 100, 1600),
+}
+# metrics compared against a baseline, and whether a larger number is better
+COMPARED = {"games_per_sec": True, "move_mean_ms": False, "move_p99_ms": False}
+
+
+def init():
+    global args
+    parser = argparse.ArgumentParser(description="Measure how quickly the agents play minesweeper")
+    parser.add_argument("-a", "--agent",
+                        help="Specify the agents to benchmark",
+                        choices=["simple", "set", "linear"],
+                        nargs="+",
+                        default=["simple", "set"])
+    parser.add_argument("-b", "--backend",
+                        help="Specify how the game state is stored and searched",
+                        choices=["set", "bit"],
+                        default="set")
+    parser.add_argument("-d", "--boards",
+                        help="Specify the boards to benchmark on",
+                        choices=list(BOARDS.keys()),
+                        nargs="+",
+                        default=["beginner", "intermediate", "expert", "large"])
+    parser.add_argument("--board",
+                        help="Add a custom board of the given rows, columns and mines to benchmark on",
+                        type=int,
+                        nargs=3,
+                        action="append",
+                        metavar=("ROWS", "COLUMNS", "MINES"),
+                        default=[])
+    parser.add_argument("--pattern-cache",
+                        help="Give the agents a cache of deductions for up to this many local patterns, "
+                             "to measure how often they repeat rather than for speed",
+                        type=int,
+                        default=None)
+    parser.add_argument("-n", "--games",
+                        help="The number of games played on each board, seeded 0 to n - 1",
+                        type=int,
+                        default=50)
+    parser.add_argument("-o", "--output",
+                        help="File location to write results to as JSON",
+                        default=None)
+    parser.add_argument("--baseline",
+                        help="File location of earlier results to compare against",
+                        default=None)
+    parser.add_argument("--tolerance",
+                        help="The fraction a metric can be worse than the baseline by before it counts as a regression",
+                        type=float,
+                        default=0.1)
+    args = parser.parse_args()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def timed(function: Callable, totals: dict[str, float], name: str, nested: list[float]) -> Callable:
+    # times are exclusive: whatever a timed call spends in other timed calls inside it is counted only for those
+    def wrapper(*a, **kw):
+        start = perf_counter()
+        nested.append(0.0)
+        try:
+            return function(*a, **kw)
+        finally:
+            elapsed = perf_counter() - start
+            totals[name] += elapsed - nested.pop()
+            if nested:
+                nested[-1] += elapsed
+    return wrapper
+
+
+def bench(spec: GameSpec, games: int) -> dict:
+    # a clean run for throughput, as the instrumented one below is slowed down by its own timing
+    game = make_game(spec)
+    agent = make_agent(spec, game)
+    win_count = 0
+    start = perf_counter()
+    for seed in range(games):
+        game.random.seed(seed)
+        agent.random.seed(seed)
+        game.reset()
+        agent.play()
+        win_count += game.winning_state()
+    elapsed = perf_counter() - start
+    pattern_stats = agent.patterns.stats() if agent.patterns else None
+
+    game = make_game(spec)
+    agent = make_agent(spec, game)
+    totals = {"neighbours": 0.0, "cell_value": 0.0, "pairwise": 0.0}
+    # the time spent in timed calls inside the one being timed, innermost last
+    nested = []
+    game.neighbours = timed(game.neighbours, totals, "neighbours", nested)
+    game.cell_value = timed(game.cell_value, totals, "cell_value", nested)
+    if hasattr(agent, "pairwise"):
+        agent.pairwise = timed(agent.pairwise, totals, "pairwise", nested)
+    # the time since the last move, for every step or flag the agent makes
+    latencies = []
+    last_move = [0.0]
+
+    def moved(function: Callable) -> Callable:
+        def wrapper(*a, **kw):
+            try:
+                return function(*a, **kw)
+            finally:
+                now = perf_counter()
+                latencies.append(now - last_move[0])
+                last_move[0] = now
+        return wrapper
+
+    # agents step through step_region, which makes a step of its own for every cell an opening reveals,
+    # so it's the region rather than each step that counts as one move
+    game.step_region = moved(game.step_region)
+    game.flag = moved(game.flag)
+    instrumented_start = perf_counter()
+    for seed in range(games):
+        game.random.seed(seed)
+        agent.random.seed(seed)
+        game.reset()
+        last_move[0] = perf_counter()
+        agent.play()
+    instrumented = perf_counter() - instrumented_start
+    result = {
+        "games": games,
+        "wins": win_count,
+        "games_per_sec": games / elapsed,
+        "moves": len(latencies),
+        "move_mean_ms": sum(latencies) / max(len(latencies), 1) * 1000,
+        "move_p99_ms": percentile(latencies, 0.99) * 1000,
+        "time_fraction": {name: total / instrumented for name, total in totals.items()},
+    }
+    if pattern_stats:
+        result["pattern_cache"] = pattern_stats
+    return result
+
+
+def compare(results: dict, baseline: dict) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric, larger_is_better in COMPARED.items():
+            before = baseline[name].get(metric)
+            if not before:
+                continue
+            change = result[metric] / before - 1
+            if (-change if larger_is_better else change) > args.tolerance:
+                regressions.append(f"{name} {metric}: {before:.4g} -> {result[metric]:.4g} ({change * 100:+.1f}%)")
+    return regressions
+
+
+def main():
+    boards = {name: BOARDS[name] for name in args.boards}
+    for rows, columns, mines in args.board:
+        boards[f"{rows}x{columns}x{mines}"] = (rows, columns, mines)
+    results = {}
+    for board, (rows, columns, mines) in boards.items():
+        for agent in args.agent:
+            name = f"{board}/{agent}/{args.backend}"
+            spec = GameSpec(rows, columns, mines, agent=agent, backend=args.backend, first_safe=True,
+                            pattern_cache=args.pattern_cache)
+            results[name] = bench(spec, args.games)
+            result = results[name]
+            print(f"{name}: {result['games_per_sec']:.1f} games/s, "
+                  f"{result['move_mean_ms']:.3f}ms mean / {result['move_p99_ms']:.3f}ms p99 per move, "
+                  + ", ".join(f"{k} {v * 100:.1f}%" for k, v in result["time_fraction"].items())
+                  + (f", pattern hit rate {result['pattern_cache']['hit_rate'] * 100:.1f}%" if "pattern_cache" in result else ""))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"python": platform.python_version(), "results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"])
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == '__main__':
+    args: argparse.Namespace
+    init()
+    main()
@@ -0,0 +1,52 @@
+from simpleagent import SimpleAgent
+from setagent import SetAgent
+from linearagent import LinearAgent
+from bitgame import BitMinesweeper
+from probability import ProbabilityEngine
+from patterncache import PatternCache
+
+
+class BitSimpleAgent(SimpleAgent):
+
+    def __init__(self, game: BitMinesweeper, seed=None, patterns: PatternCache = None):
+        super().__init__(game, seed=seed, patterns=patterns)
+
+    def primitive(self, c: tuple[int, int]) -> tuple[set[tuple[int, int]], set[tuple[int, int]]]:
+        if c not in self.game.border:
+            return set(), set()
+        # the masks only decide, the cells themselves come from the same set operations as SimpleAgent
+        # so that they iterate in the same order and both agents play identical games
+        unknown = (self.game.neighbour_bits[c] & self.game.unknown_bits).bit_count()
+        flagged = (self.game.neighbour_bits[c] & self.game.flagged_bits).bit_count()
+        value = self.game.cell_value(c)
+        if unknown + flagged == value or flagged == value:
+            return SimpleAgent.primitive(self, c)
+        return set(), set()
+
+
+class BitSetAgent(SetAgent, BitSimpleAgent):
+
+    def __init__(self, game: BitMinesweeper, seed=None, probability: ProbabilityEngine = None, patterns: PatternCache = None):
+        super().__init__(game, seed=seed, probability=probability, patterns=patterns)
+
+    def pairwise(self, a: tuple[int, int], b: tuple[int, int]) -> tuple[set[tuple[int, int]], set[tuple[int, int]]]:
+        an = self.game.neighbour_bits[a]
+        bn = self.game.neighbour_bits[b]
+        pos_cells = (an & ~bn & self.game.unknown_bits).bit_count()
+        neg_cells = (bn & ~an & self.game.unknown_bits).bit_count()
+        if not pos_cells + neg_cells:
+            return set(), set()
+        vdiff = self.game.cell_value(a) - self.game.cell_value(b)
+        fdiff = (an & self.game.flagged_bits).bit_count() - (bn & self.game.flagged_bits).bit_count()
+        if vdiff - fdiff == pos_cells or fdiff - vdiff == neg_cells:
+            return SetAgent.pairwise(self, a, b)
+        return set(), set()
+
+    def overlapping(self, a: tuple[int, int], b: tuple[int, int]) -> bool:
+        return self.game.neighbour_bits[a] & self.game.neighbour_bits[b] != 0
+
+
+class BitLinearAgent(LinearAgent, BitSetAgent):
+
+    def __init__(self, game: BitMinesweeper, seed=None, probability: ProbabilityEngine = None, patterns: PatternCache = None):
+        super().__init__(game, seed=seed, probability=probability, patterns=patterns)
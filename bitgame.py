@@ -0,0 +1,48 @@
+from typing import Iterable
+from game import Minesweeper
+
+
+class BitMinesweeper(Minesweeper):
+    """
+    Minesweeper backend storing its state as integer bitmasks, one bit per cell in row major order.
+    The set based attributes are kept in step with the masks so the board can still be drawn and
+    played by agents which don't know about bits.
+    """
+
+    def __init__(self, rows: int, columns: int, mines: int, seed=None, first_safe=False):
+        self.grid_bits: int = None
+        self.stepped_bits: int = None
+        self.flagged_bits: int = None
+        self.unknown_bits: int = None
+        self.bits: dict[tuple[int, int], int] = None
+        self.neighbour_bits: dict[tuple[int, int], int] = None
+        super().__init__(rows, columns, mines, seed=seed, first_safe=first_safe)
+
+    def reset(self, mines: Iterable[tuple[int, int]] = None):
+        super().reset(mines)
+        if self.bits is None:
+            self.bits = {cell: 1 << (cell[0] * self.col_count + cell[1]) for cell in self.grid}
+            self.neighbour_bits = {cell: self.to_bits(neighbours) for cell, neighbours in self._neighbours.items()}
+        self.grid_bits = (1 << (self.row_count * self.col_count)) - 1
+        self.stepped_bits = 0
+        self.flagged_bits = 0
+        self.unknown_bits = self.grid_bits
+
+    def to_bits(self, cells: Iterable[tuple[int, int]]) -> int:
+        bits = 0
+        for cell in cells:
+            bits |= self.bits[cell]
+        return bits
+
+    def step(self, cell: tuple[int, int]) -> int:
+        # the base class marks the cell as stepped on before it explodes, so we do too
+        self.stepped_bits |= self.bits[cell]
+        self.unknown_bits &= ~self.bits[cell]
+        return super().step(cell)
+
+    def flag(self, cell: tuple[int, int]) -> bool:
+        if super().flag(cell):
+            self.flagged_bits |= self.bits[cell]
+            self.unknown_bits &= ~self.bits[cell]
+            return True
+        return False
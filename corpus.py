@@ -0,0 +1,202 @@
+from batch import GameSpec, game_seeds, player
+from functools import partial
+from itertools import combinations
+from multiprocessing import Pool
+from stats import mcnemar
+from time import perf_counter
+from vectorgame import neighbour_sum
+import argparse
+import json
+import numpy as np
+
+# boards are generated and counted this many at a time, to keep memory down for big corpora
+GENERATE_BATCH = 1024
+
+
+class Corpus:
+    """
+    A set of boards generated ahead of time, so every agent can be played on exactly the same ones.
+    Boards are stored as in Minesweeper.get_board, 9 for a mine and otherwise the number of mines around the cell,
+    in one int8 .npy file of shape (boards, rows, columns) which is memory-mapped rather than read in,
+    alongside a .json file of how they were made.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path + ".json") as f:
+            self.meta = json.load(f)
+        self.boards = np.load(path + ".npy", mmap_mode="r")
+        self.rows, self.columns, self.mines = self.meta["rows"], self.meta["columns"], self.meta["mines"]
+
+    def __len__(self) -> int:
+        return len(self.boards)
+
+    def mine_cells(self, index: int) -> list[tuple[int, int]]:
+        rows, cols = np.nonzero(self.boards[index] == 9)
+        return list(zip(rows.tolist(), cols.tolist()))
+
+
+def generate(path: str, count: int, rows: int, columns: int, mines: int, seed: int) -> Corpus:
+    boards = np.lib.format.open_memmap(path + ".npy", mode="w+", dtype=np.int8, shape=(count, rows, columns))
+    for start in range(0, count, GENERATE_BATCH):
+        end = min(start + GENERATE_BATCH, count)
+        layout = np.zeros((end - start, rows * columns), dtype=np.int8)
+        for i in range(start, end):
+            # each board is seeded on its own, so a corpus can be extended or regenerated a board at a time
+            layout[i - start, np.random.default_rng([seed, i]).choice(rows * columns, mines, replace=False)] = 1
+        layout = layout.reshape(-1, rows, columns)
+        values = neighbour_sum(layout)
+        values[layout == 1] = 9
+        boards[start:end] = values
+    boards.flush()
+    del boards
+    with open(path + ".json", 'w') as f:
+        json.dump({"rows": rows, "columns": columns, "mines": mines, "count": count, "seed": seed}, f, indent=2)
+    return Corpus(path)
+
+
+# each worker process opens the corpus itself, so the boards are shared through the page cache and never copied
+_corpus: Corpus = None
+
+
+def open_corpus(path: str):
+    global _corpus
+    _corpus = Corpus(path)
+
+
+def play_board(spec: GameSpec, board_seed: int, agent_seed: int, task: tuple[str, int]) -> tuple[str, int, bool]:
+    agent_name, index = task
+    game, agent = player(spec._replace(agent=agent_name))
+    # every agent gets the same seeds on a board, so where first-safe moves a mine to doesn't depend on the agent
+    game_board_seed, game_agent_seed = game_seeds(board_seed, agent_seed, index)
+    game.random.seed(game_board_seed)
+    agent.random.seed(game_agent_seed)
+    game.reset(_corpus.mine_cells(index))
+    agent.play()
+    return agent_name, index, game.winning_state()
+
+
+def compare(wins: dict[str, list[bool]]) -> list[dict]:
+    comparisons = []
+    for a, b in combinations(wins.keys(), 2):
+        both = sum(x and y for x, y in zip(wins[a], wins[b]))
+        only_a = sum(x and not y for x, y in zip(wins[a], wins[b]))
+        only_b = sum(y and not x for x, y in zip(wins[a], wins[b]))
+        comparisons.append({
+            "a": a,
+            "b": b,
+            "both": both,
+            "only_a": only_a,
+            "only_b": only_b,
+            "neither": len(wins[a]) - both - only_a - only_b,
+            "p_value": mcnemar(only_a, only_b),
+        })
+    return comparisons
+
+
+def init():
+    global args
+    parser = argparse.ArgumentParser(description="Generate a corpus of minesweeper boards, or play agents against one")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate_parser = commands.add_parser("generate", help="Generate a corpus of boards")
+    generate_parser.add_argument("corpus",
+                                 help="File location of the corpus, without an extension")
+    generate_parser.add_argument("-n", "--boards",
+                                 help="The number of boards to generate",
+                                 type=int,
+                                 default=10000)
+    generate_parser.add_argument("-r", "--rows",
+                                 help="Specify the number of rows of the boards",
+                                 type=int,
+                                 default=16)
+    generate_parser.add_argument("-c", "--columns",
+                                 help="Specify the number of columns of the boards",
+                                 type=int,
+                                 default=30)
+    generate_parser.add_argument("-m", "--mines",
+                                 help="Specify the mine count of the boards",
+                                 type=int,
+                                 default=99)
+    generate_parser.add_argument("-s", "--seed",
+                                 help="Specify the seed the boards are generated from",
+                                 type=int,
+                                 default=0)
+    tournament_parser = commands.add_parser("tournament", help="Play agents against every board of a corpus")
+    tournament_parser.add_argument("corpus",
+                                   help="File location of the corpus, without an extension")
+    tournament_parser.add_argument("-a", "--agent",
+                                   help="Specify the agents to play",
+                                   choices=["simple", "set", "linear"],
+                                   nargs="+",
+                                   default=["simple", "set"])
+    tournament_parser.add_argument("-b", "--backend",
+                                   help="Specify how the game state is stored and searched",
+                                   choices=["set", "bit"],
+                                   default="set")
+    tournament_parser.add_argument("--agent-seed",
+                                   help="Specify the seed for the agents, the same for every agent on a board",
+                                   type=int,
+                                   default=0)
+    tournament_parser.add_argument("--first-safe",
+                                   help="Ensures the first tile clicked cannot be a mine",
+                                   action="store_true")
+    tournament_parser.add_argument("--workers",
+                                   help="Spread the games played across this many worker processes",
+                                   type=int,
+                                   default=None)
+    tournament_parser.add_argument("-o", "--output",
+                                   help="File location to write the win rates and comparisons to as JSON",
+                                   default=None)
+    args = parser.parse_args()
+    if args.command == "tournament" and args.workers is not None and args.workers < 1:
+        tournament_parser.error("--workers needs to be at least one process")
+
+
+def tournament():
+    corpus = Corpus(args.corpus)
+    spec = GameSpec(corpus.rows, corpus.columns, corpus.mines, backend=args.backend, first_safe=args.first_safe)
+    wins = {agent: [False] * len(corpus) for agent in args.agent}
+    tasks = [(agent, index) for agent in args.agent for index in range(len(corpus))]
+    play = partial(play_board, spec, corpus.meta["seed"], args.agent_seed)
+    start = perf_counter()
+    if args.workers == 1:
+        open_corpus(args.corpus)
+        for agent, index, won in map(play, tasks):
+            wins[agent][index] = won
+    else:
+        with Pool(args.workers, initializer=open_corpus, initargs=(args.corpus,)) as pool:
+            for agent, index, won in pool.imap_unordered(play, tasks, chunksize=64):
+                wins[agent][index] = won
+    elapsed = perf_counter() - start
+    print(f"Played {len(tasks)} games on {len(corpus)} boards in {elapsed:.1f}s")
+    for agent, won in wins.items():
+        print(f"{agent}: won {sum(won)} ({sum(won) / len(corpus) * 100:.2f}%)")
+    comparisons = compare(wins)
+    for c in comparisons:
+        print(f"{c['a']} vs {c['b']}: both won {c['both']}, only {c['a']} {c['only_a']}, only {c['b']} {c['only_b']}, "
+              f"neither {c['neither']}, McNemar p = {c['p_value']:.4g}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                "corpus": corpus.meta,
+                "backend": args.backend,
+                "first_safe": args.first_safe,
+                "agent_seed": args.agent_seed,
+                "win_rates": {agent: sum(won) / len(corpus) for agent, won in wins.items()},
+                "comparisons": comparisons,
+            }, f, indent=2)
+
+
+def main():
+    if args.command == "generate":
+        start = perf_counter()
+        corpus = generate(args.corpus, args.boards, args.rows, args.columns, args.mines, args.seed)
+        print(f"Generated {len(corpus)} boards in {perf_counter() - start:.1f}s")
+    else:
+        tournament()
+
+
+if __name__ == '__main__':
+    args: argparse.Namespace
+    init()
+    main()
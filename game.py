@@ -1,7 +1,9 @@
-from typing import Iterable, IO
+from typing import Iterable
 from itertools import product as iter_prod
 from random import Random
 import numpy as np
+from render import TerminalRenderer
+from vectorgame import neighbour_sum
 
 
 class Minesweeper:
@@ -12,120 +14,171 @@ class Minesweeper:
         self._mines: set[tuple[int, int]] = None
         self.flagged: set[tuple[int, int]] = None
         self._ignore_mine: bool = None
+        self._neighbours: dict[tuple[int, int], set[tuple[int, int]]] = None
+        self._values: dict[tuple[int, int], int] = None
+        # every cell in row major order, matching the layout of the arrays below
+        self._cells: list[tuple[int, int]] = None
+        self._board: np.ndarray = None
+        # stepped on cells with unknown neighbours, and unknown cells next to stepped on ones
+        self.border: set[tuple[int, int]] = None
+        self.frontier: set[tuple[int, int]] = None
+        self._unknown_neighbours: dict[tuple[int, int], int] = None
+        self._unknown_count: int = None
+        self._flagged_mines: int = None
+        self._exploded: bool = None
         self.col_count = columns
         self.row_count = rows
         self.mine_count = mines
         self.first_safe = first_safe
         self.random = Random(seed)
+        self.renderer = TerminalRenderer()
+        # told about every game and move when set, such as a ReplayRecorder
+        self.recorder = None
         self.reset()
 
-    def reset(self):
+    def reset(self, mines: Iterable[tuple[int, int]] = None):
+        # mines can be given to play a board laid out beforehand, otherwise they're placed at random
         self.grid = {(row, col) for row, col in iter_prod(range(self.row_count), range(self.col_count))}
         self.stepped = set()
-        self._mines = set(self.random.sample(tuple(self.grid), self.mine_count))
+        if mines is None:
+            self._mines = set(self.random.sample(tuple(self.grid), self.mine_count))
+        else:
+            self._mines = set(mines)
         self.flagged = set()
         self._ignore_mine = self.first_safe
+        self.border = set()
+        self.frontier = set()
+        self._unknown_count = len(self.grid)
+        self._flagged_mines = 0
+        self._exploded = False
+        self.renderer.invalidate()
+        # neighbourhoods only depend on the board dimensions, so they're shared between games
+        if self._neighbours is None:
+            self._neighbours = {
+                cell: self.grid & {(cell[0] + row, cell[1] + col) for row, col in iter_square(range(-1, 2)) if row or col}
+                for cell in self.grid
+            }
+            self._cells = sorted(self.grid)
+        # mine counts never change during a game (besides first-safe relocation), so we count them once here
+        mines = np.zeros((self.row_count, self.col_count), dtype=np.int8)
+        if self._mines:
+            mines[tuple(zip(*self._mines))] = 1
+        board = neighbour_sum(mines)
+        self._values = dict(zip(self._cells, board.ravel().tolist()))
+        board[mines == 1] = 9
+        self._board = board
+        self._unknown_neighbours = {cell: len(self._neighbours[cell]) for cell in self.grid}
+        if self.recorder:
+            self.recorder.start(self)
 
     def winning_state(self):
-        if len(self.stepped & self._mines) > 0:
+        if self._exploded:
             return False
         if self.mines_remaining() == 0:
             return True
         return False
 
     def neighbours(self, cell: tuple[int, int]) -> set[tuple[int, int]]:
-        naive_neighbours = set((cell[0] + row, cell[1] + col) for row, col in iter_square(range(-1, 2)))
-        naive_neighbours.remove(cell)
-        return set.intersection(self.grid, naive_neighbours)
+        # shared with the lookup table, so callers must treat this as read-only
+        return self._neighbours[cell]
 
     def cell_value(self, cell: tuple[int, int]) -> int:
         if cell not in self.stepped:
             raise ValueError("That's cheating!")
-        return len(set.intersection(self.neighbours(cell), self._mines))
+        return self._values[cell]
 
-    def step(self, cell: tuple[int, int], f: IO = None) -> int:
+    def step(self, cell: tuple[int, int]) -> int:
+        if self.recorder:
+            self.recorder.step(cell)
+        unknown = cell not in self.stepped and cell not in self.flagged
         self.stepped.add(cell)
+        self._known(cell, unknown)
         if cell in self._mines:
             if self._ignore_mine:
-                new_mine = self.random.choice(tuple(self.grid - self.stepped - self._mines))
-                self._mines.remove(cell)
-                self._mines.add(new_mine)
-                if f:
-                    f.write(f"""    values = np.array({str(self.get_board()).replace(" ", ",")})
-    self.remove(cell_nums)
-    cell_nums=Group(*(Text(str(v),color=colors[v],font_size=32/0.75*tile_size) if v<9 else mine_cell.copy() for v in values.flatten()))
-    for index in range(rows * cols): cell_nums[index].move_to(cell_grid[index])
-    self.bring_to_back(cell_nums)
-""")
+                self.relocate(cell)
             else:
+                self._exploded = True
                 raise ValueError("Boom!")
         self._ignore_mine = False
         return self.cell_value(cell)
 
+    def relocate(self, cell: tuple[int, int]):
+        # moves the mine under a first step somewhere not yet stepped on, for first-safe
+        new_mine = self.random.choice(tuple(self.grid - self.stepped - self._mines))
+        self._mines.remove(cell)
+        self._mines.add(new_mine)
+        self._flagged_mines += (new_mine in self.flagged) - (cell in self.flagged)
+        for neighbour in self._neighbours[cell]:
+            self._values[neighbour] -= 1
+        for neighbour in self._neighbours[new_mine]:
+            self._values[neighbour] += 1
+        # only the cells around the old and new mine have changed
+        for changed in (cell, new_mine):
+            for neighbour in self._neighbours[changed] | {changed}:
+                self._board[neighbour] = 9 if neighbour in self._mines else self._values[neighbour]
+        if self.recorder:
+            self.recorder.relocate(new_mine)
+
+    def _known(self, cell: tuple[int, int], unknown: bool):
+        # keeps the counters and frontier up to date after a cell has been stepped on or flagged
+        if unknown:
+            self._unknown_count -= 1
+            self.frontier.discard(cell)
+            for neighbour in self.neighbours(cell):
+                self._unknown_neighbours[neighbour] -= 1
+                if not self._unknown_neighbours[neighbour]:
+                    self.border.discard(neighbour)
+        if cell in self.stepped and self._unknown_neighbours[cell]:
+            self.border.add(cell)
+            for neighbour in self.neighbours(cell):
+                if neighbour not in self.stepped and neighbour not in self.flagged:
+                    self.frontier.add(neighbour)
+
+    def step_region(self, cell: tuple[int, int]) -> dict[tuple[int, int], int]:
+        # steps onto a cell and, if it's a zero, floods out through the zeros it joins up with and the numbers
+        # bordering them, returning every cell revealed along with its value
+        revealed = {cell: self.step(cell)}
+        zeros = [cell] if revealed[cell] == 0 else []
+        while zeros:
+            for neighbour in self.neighbours(zeros.pop()):
+                # a zero has no mines around it, so none of these can explode
+                if neighbour not in self.stepped and neighbour not in self.flagged:
+                    value = self.step(neighbour)
+                    revealed[neighbour] = value
+                    if value == 0:
+                        zeros.append(neighbour)
+        return revealed
+
     def flag(self, cell: tuple[int, int]) -> bool:
         if cell in self.stepped:
             return False
-        self.flagged.add(cell)
+        if cell not in self.flagged:
+            if self.recorder:
+                self.recorder.flag(cell)
+            self.flagged.add(cell)
+            self._flagged_mines += cell in self._mines
+            self._known(cell, True)
         return True
 
+    def random_unknown(self, random: Random, exclude: Iterable[tuple[int, int]] = ()) -> tuple[int, int]:
+        # raises IndexError if every cell has been stepped on, flagged or excluded
+        unknown = self.grid - self.flagged - self.stepped
+        if exclude:
+            unknown -= set(exclude)
+        return random.choice(list(unknown))
+
     def mines_remaining(self):
-        return len(self._mines - self.flagged)
+        return self.mine_count - self._flagged_mines
 
     def tiles_remaining(self):
-        return len(self.grid - self.stepped - self.flagged)
+        return self._unknown_count
 
     def draw(self, **kwargs):
-        show_mines = kwargs['show_mines'] if "show_mines" in kwargs.keys() else False
-        coloured = kwargs['coloured'] if 'coloured' in kwargs.keys() else False
-        highlighted = kwargs['highlighted'] if "highlighted" in kwargs.keys() else (-1, -1)
-        underlined = kwargs['underlined'] if 'underlined' in kwargs.keys() else (-1, -1)
-        bold = kwargs['bold'] if 'bold' in kwargs.keys() else (-1, -1)
-        italic = kwargs['italic'] if 'italic' in kwargs.keys() else (-1, -1)
-        end = kwargs['end'] if 'end' in kwargs.keys() else "\n"
-        if highlighted.__class__ is not list:
-            highlighted = [highlighted]
-        if underlined.__class__ is not list:
-            underlined = [underlined]
-        if bold.__class__ is not list:
-            bold = [bold]
-        if italic.__class__ is not list:
-            italic = [italic]
-        for row in range(self.row_count):
-            for col in range(self.col_count):
-                if (row, col) in highlighted:
-                    print("\x1b[103m", end="")
-                if (row, col) in underlined:
-                    print("\x1b[4m", end="")
-                if (row, col) in bold:
-                    print("\x1b[1m", end="")
-                if (row, col) in italic:
-                    print("\x1b[3m", end="")
-                if (row, col) in self.stepped:
-                    if (row, col) in self._mines:
-                        print("\x1b[91mX" if coloured else "X", end="\x1b[m " if coloured else " ")
-                    else:
-                        value = self.cell_value((row, col))
-                        if coloured:
-                            print(f"\x1b[3{value}m{value}", end="\x1b[m ")
-                        else:
-                            print(value, end=" ")
-                elif (row, col) in self.flagged:
-                    print("\x1b[94mF" if coloured else "F", end="\x1b[m " if coloured else " ")
-                else:
-                    if show_mines and (row, col) in self._mines:
-                        print("\x1b[91mM" if coloured else "M", end="\x1b[m " if coloured else " ")
-                    else:
-                        print("#", end=" ")
-            print()
-        print(end=end)
+        self.renderer.draw(self, self._mines, **kwargs)
 
     def get_board(self) -> np.ndarray:
-        board = np.zeros((self.row_count, self.col_count), dtype=np.int8)
-        for cell in iter_prod(range(self.row_count), range(self.col_count)):
-            board[cell] = len(set.intersection(self.neighbours(cell), self._mines))
-        for mine in self._mines:
-            board[mine] = 9
-        return board
+        # a copy, so the board kept up to date through first-safe relocation can't be changed from outside
+        return self._board.copy()
 
 
 def iter_square(i: Iterable) -> Iterable:
@@ -0,0 +1,102 @@
+import numpy as np
+from game import Minesweeper
+from setagent import SetAgent, PairIndex
+from probability import ProbabilityEngine, frontier
+from patterncache import PatternCache
+
+# how far from a whole number a reduced coefficient can drift before it's taken to mean something
+TOLERANCE = 1e-9
+
+
+class LinearAgent(SetAgent):
+    """
+    Agent which, once primitive has nothing left, writes the whole frontier as a system of linear equations,
+    one row per stepped on cell and one column per unknown cell beside it, each row summing to the mines left
+    around that cell. Each independent part of the frontier is row reduced once per round with NumPy and every cell
+    forced to be safe or a mine by the bounds of some row is read off, which covers pairwise and deductions
+    needing any number of constraints at once.
+    """
+    frontier_phase = "linear"
+
+    def __init__(self, game: Minesweeper, seed=None, probability: ProbabilityEngine = None, patterns: PatternCache = None):
+        super().__init__(game, seed=seed, probability=probability, patterns=patterns)
+        # the parts of the frontier which had nothing to give last round, as the same constraints give the same answer
+        self.settled: set[tuple] = set()
+
+    def frontier_round(self, to_pair_search: PairIndex, to_step: set[tuple[int, int]], to_flag: set[tuple[int, int]],
+                       to_search: set[tuple[int, int]]) -> tuple[int, int]:
+        iterations = 0
+        deductions = 0
+        settled = set()
+        for key in frontier(self.game):
+            # a lone constraint has nothing to add to what primitive already found
+            if key in self.settled or len(key[1]) < 2:
+                settled.add(key)
+                continue
+            safe, mines = self.linear(*key)
+            iterations += 1
+            deductions += len(safe) + len(mines)
+            if safe or mines:
+                to_step |= safe
+                to_flag |= mines
+            else:
+                settled.add(key)
+        self.settled = settled
+        return iterations, deductions
+
+    def linear(self, cells: tuple[tuple[int, int], ...], constraints: tuple) -> tuple[set[tuple[int, int]], set[tuple[int, int]]]:
+        index = {cell: i for i, cell in enumerate(cells)}
+        matrix = np.zeros((len(constraints), len(cells) + 1))
+        for row, (constraint_cells, mines) in enumerate(constraints):
+            matrix[row, [index[c] for c in constraint_cells]] = 1
+            matrix[row, -1] = mines
+        # reduction can spread a row's bounds too thin to say anything, so the original rows and the differences
+        # between overlapping pairs of them, which is all pairwise looks at, are checked alongside the reduced ones
+        coefficients = matrix[:, :-1]
+        first, second = np.nonzero(np.triu(coefficients @ coefficients.T, 1))
+        safe, mine = forced(np.vstack((matrix, matrix[first] - matrix[second], reduce(matrix))))
+        return {cells[i] for i in np.flatnonzero(safe)}, {cells[i] for i in np.flatnonzero(mine)}
+
+
+def reduce(matrix: np.ndarray) -> np.ndarray:
+    # reduced row echelon form by Gauss-Jordan elimination with partial pivoting, the last column being the totals
+    matrix = matrix.copy()
+    rows, columns = matrix.shape
+    pivot_row = 0
+    for column in range(columns - 1):
+        if pivot_row == rows:
+            break
+        pivot = pivot_row + np.argmax(np.abs(matrix[pivot_row:, column]))
+        if abs(matrix[pivot, column]) < TOLERANCE:
+            continue
+        matrix[[pivot_row, pivot]] = matrix[[pivot, pivot_row]]
+        matrix[pivot_row] /= matrix[pivot_row, column]
+        factors = matrix[:, column].copy()
+        factors[pivot_row] = 0
+        matrix -= np.outer(factors, matrix[pivot_row])
+        pivot_row += 1
+    matrix[np.abs(matrix) < TOLERANCE] = 0
+    return matrix[:pivot_row]
+
+
+def forced(matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the cells every row's bounds force to be safe or a mine, with each cell either 0 or 1.
+    Setting a cell one way must leave the rest of its row able to reach the row's total, between the sum of its
+    negative coefficients and the sum of its positive ones, otherwise the cell has to go the other way.
+    """
+    coefficients = matrix[:, :-1]
+    totals = matrix[:, -1:]
+    positive = np.clip(coefficients, 0, None)
+    negative = np.clip(coefficients, None, 0)
+    high = positive.sum(axis=1, keepdims=True)
+    low = negative.sum(axis=1, keepdims=True)
+    # the furthest the rest of a row can reach with the cell set to 0 or to 1
+    zero_high = high - positive
+    zero_low = low - negative
+    one_high = zero_high + coefficients
+    one_low = zero_low + coefficients
+    involved = np.abs(coefficients) > TOLERANCE
+    cant_be_mine = involved & ((one_low > totals + TOLERANCE) | (one_high < totals - TOLERANCE))
+    cant_be_safe = involved & ((zero_low > totals + TOLERANCE) | (zero_high < totals - TOLERANCE))
+    return cant_be_mine.any(axis=0), cant_be_safe.any(axis=0)
@@ -1,8 +1,17 @@
-from simpleagent import SimpleAgent
-from setagent import SetAgent
-from game import Minesweeper
+from batch import GameSpec, make_game, make_agent, play_games, game_seeds
+from vectorgame import MinesweeperBatch
+from vectoragent import VectorSimpleAgent, VectorSetAgent
+from tileagent import TileSimpleAgent, TileSetAgent
+from profiling import PhaseCollector
+from results import ResultSink
+from replay import ReplayRecorder
+from manimsrcgen import scene_header, replay_source
+from stats import wilson, mcnemar
 import argparse
+from multiprocessing import Pool
 from random import Random
+from time import perf_counter
+import sys
 
 
 # Windows difficulties:
@@ -28,13 +37,26 @@ def init():
                                  type=int)
     parser.add_argument("-a", "--agent",
                         help="Specify the agent to play the game",
-                        choices=["simple", "set"],
+                        choices=["simple", "set", "linear"],
                         default="set")
+    parser.add_argument("-b", "--backend",
+                        help="Specify how the game state is stored and searched",
+                        choices=["set", "bit", "sparse", "vector", "tiled"],
+                        default="set")
+    parser.add_argument("--batch-size",
+                        help="The number of boards played at once by the vector backend",
+                        type=int,
+                        default=1000)
+    parser.add_argument("--tile-size",
+                        help="The width and height of the tiles the tiled backend splits each board into",
+                        type=int,
+                        default=256)
     size_group = parser.add_mutually_exclusive_group()
     size_group.add_argument("-d", "--difficulty",
-                            help="Specify the difficulty of the board using defaults from the original game",
+                            help="Specify the difficulty of the board using defaults from the original game, "
+                                 "in place of --rows, --columns and --mines, whose own defaults are the expert board",
                             choices=["beginner", "intermediate", "expert"],
-                            default="expert")
+                            default=None)
     dimensions_group = size_group.add_argument_group()
     dimensions_group.add_argument("-r", "--rows", "-H", "--height",
                                   help="Specify the number of rows of the board",
@@ -48,12 +70,39 @@ def init():
                                   help="Specify the mine count of the board",
                                   type=int,
                                   default=99)
+    parser.add_argument("--exact-guess",
+                        help="Guess using exact mine probabilities when the set or linear agent runs out of deductions",
+                        action="store_true")
+    parser.add_argument("--guess-time",
+                        help="Milliseconds allowed for working out exact probabilities before falling back on estimates",
+                        type=float,
+                        default=100)
+    parser.add_argument("--guess-cells",
+                        help="The most cells in one independent part of the frontier to work out exact probabilities for",
+                        type=int,
+                        default=48)
+    parser.add_argument("--pattern-cache",
+                        help="Remember the deductions made for up to this many local patterns of the board, "
+                             "printing how often they were reused. For measuring only, as it slows the agents down",
+                        type=int,
+                        default=None)
+    parser.add_argument("--server",
+                        help="Play on a game server started by server.py, at host:port or the file location of a unix "
+                             "socket, rather than in this process",
+                        default=None)
+    parser.add_argument("--check-local",
+                        help="With --server, play every game in this process as well, seeded as with --workers, "
+                             "and exit with an error if any played out differently",
+                        action="store_true")
     parser.add_argument("-C", "--coloured",
                         help="Specify whether the board is coloured in previews",
                         action="store_true")
     parser.add_argument("-v", "--verbosity",
                         help="Increase output verbosity",
                         action="count")
+    parser.add_argument("--incremental-draw",
+                        help="Only redraw the cells which changed between previews of the board",
+                        action="store_true")
     parser.add_argument("--show-mines",
                         help="Show the location of all mines on the board",
                         action="store_true")
@@ -65,12 +114,50 @@ def init():
                         help="The number of times the bot should play",
                         type=int,
                         default=1)
+    parser.add_argument("--precision",
+                        help="Stop playing once the win rate is known to within this many percentage points either way, "
+                             "with --play-count as the most games played",
+                        type=float,
+                        default=None)
+    parser.add_argument("--compare-agent",
+                        help="Play this agent on the same games as well, stopping once the difference between the two "
+                             "win rates is significant, with --play-count as the most games played by each",
+                        choices=["simple", "set", "linear"],
+                        default=None)
+    parser.add_argument("--confidence",
+                        help="The confidence in percent of the interval on the win rate and the test between agents",
+                        type=float,
+                        default=95)
+    parser.add_argument("--check-every",
+                        help="The number of games played between checks of whether to stop",
+                        type=int,
+                        default=100)
+    parser.add_argument("--workers",
+                        help="Spread the games played across this many worker processes, "
+                             "seeding each game from the global seeds and its index. Without it each game carries on "
+                             "from the random state the last one left, so the same seeds give different games",
+                        type=int,
+                        default=None)
+    parser.add_argument("--results",
+                        help="File location to stream the result of each game to, as one line of JSON per game. "
+                             "Games are seeded from the global seeds and their index, as with --workers",
+                        default=None)
+    parser.add_argument("--resume",
+                        help="Skip games already recorded in the results file rather than starting it again",
+                        action="store_true")
+    parser.add_argument("--phase-profile",
+                        help="File location to write the time and deductions of each phase of the agent's play to, "
+                             "as one line of JSON per game",
+                        default=None)
     parser.add_argument("--step-by-step",
                         help="Enables pausing the program at notable moments",
                         action="store_true")
     parser.add_argument("--first-safe",
                         help="Ensures the first tile clicked cannot be a mine",
                         action="store_true")
+    parser.add_argument("--replay",
+                        help="File location to record every game played to, in the compact binary format read by replay.py",
+                        default=None)
     parser.add_argument("--manim-src",
                         help="File location for generated manimation source file for this game.",
                         default=None)
@@ -84,6 +171,45 @@ def init():
                         help="File location for the mine graphic used in the generated manimation source file.",
                         default=None)
     args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers needs to be at least one process")
+    if args.workers is not None and (args.manim_src or args.replay):
+        parser.error("--manim-src and --replay can't be used with --workers")
+    if args.backend == "sparse" and (args.manim_src or args.replay):
+        parser.error("--manim-src and --replay can't be used with the sparse backend")
+    arrays = args.backend in ("vector", "tiled")
+    if args.backend == "vector" and args.workers is not None:
+        parser.error("--workers can't be used with the vector backend")
+    if arrays and (args.manim_src or args.replay):
+        parser.error("--manim-src and --replay can't be used with the vector or tiled backends")
+    if args.exact_guess and (args.agent == "simple" or args.compare_agent == "simple" or arrays):
+        parser.error("--exact-guess can only be used by the set and linear agents, and not with the vector or tiled backends")
+    if arrays and args.agent == "linear":
+        parser.error("the linear agent can't be used with the vector or tiled backends")
+    if args.phase_profile and (args.workers is not None or arrays):
+        parser.error("--phase-profile can't be used with --workers or the vector or tiled backends")
+    if args.results and (args.manim_src or args.replay or args.phase_profile or arrays):
+        parser.error("--results can't be used with --manim-src, --replay, --phase-profile or the vector or tiled backends")
+    if args.tile_size < 1:
+        parser.error("--tile-size needs to be at least one cell")
+    if args.server and (args.backend != "set" or args.manim_src or args.replay):
+        parser.error("--server can only be used with the set backend, and without --manim-src or --replay")
+    if args.check_local and (not args.server or args.results or args.precision is not None or args.compare_agent):
+        parser.error("--check-local needs --server, and can't be used with --results, --precision or --compare-agent")
+    if args.pattern_cache is not None and args.pattern_cache < 1:
+        parser.error("--pattern-cache needs room for at least one pattern")
+    stopping = args.precision is not None or args.compare_agent
+    if stopping and (args.results or args.manim_src or args.replay or args.phase_profile or arrays):
+        parser.error("--precision and --compare-agent can't be used with --results, --manim-src, --replay, "
+                     "--phase-profile or the vector or tiled backends")
+    if args.precision is not None and args.precision <= 0:
+        parser.error("--precision needs to be above zero")
+    if not 0 < args.confidence < 100:
+        parser.error("--confidence needs to be between 0 and 100")
+    if args.check_every < 1:
+        parser.error("--check-every needs to be at least one game")
+    if args.resume and not args.results:
+        parser.error("--resume needs a --results file to resume from")
 
 
 def main():
@@ -111,40 +237,248 @@ def main():
             args.mines = 99
         case _:
             pass
-    game = Minesweeper(args.rows, args.columns, args.mines, args.board_seed, first_safe=args.first_safe)
-    match args.agent:
-        case "set":
-            agent = SetAgent(game, seed=args.agent_seed)
-        case "simple":
-            agent = SimpleAgent(game, seed=args.agent_seed)
-        case _:
-            return
+    spec = GameSpec(args.rows, args.columns, args.mines, agent=args.agent, backend=args.backend, first_safe=args.first_safe,
+                    exact_guess=args.exact_guess, guess_time=args.guess_time / 1000, guess_cells=args.guess_cells,
+                    pattern_cache=args.pattern_cache, server=args.server)
+    if args.backend == "vector":
+        play_vectorised(spec)
+        return
+    if args.backend == "tiled":
+        play_tiled(spec)
+        return
+    if args.check_local:
+        check_local(spec)
+        return
+    if args.precision is not None or args.compare_agent:
+        play_sequential(spec)
+        return
+    if args.workers is not None or args.results:
+        play_parallel(spec)
+        return
+    game = make_game(spec, args.board_seed)
+    agent = make_agent(spec, game, args.agent_seed)
+    game.renderer.incremental = args.incremental_draw
     win_count = 0
     if args.manim_src:
         manim_file = open(args.manim_src, 'w')
-        manim_file.write(f"from manim import *\nimport numpy as np\nclass S{hex(args.board_seed)[2:]}{hex(args.agent_seed)[2:]}(Scene):\n  def construct(self):\n    pass\n")
+        scene_header(manim_file, args.board_seed, args.agent_seed)
     else:
         manim_file = None
+    # games are recorded as they're played, and only animated from the recording once each has finished
+    replay_file = open(args.replay, 'wb') if args.replay else None
+    if manim_file or replay_file:
+        recorder = ReplayRecorder(replay_file, args.board_seed, args.agent_seed)
+        game.recorder = recorder
+    if args.phase_profile:
+        profile_file = open(args.phase_profile, 'w')
+        collector = PhaseCollector()
+    else:
+        profile_file = None
+        collector = None
     try:
         for i in range(args.play_count):
             game.reset()
             agent.play(show_mines=args.show_mines, coloured=args.coloured, verbosity=args.verbosity,
-                       show_strategy=args.show_strategy, step_by_step=args.step_by_step, manim_file=manim_file)
+                       show_strategy=args.show_strategy, step_by_step=args.step_by_step, collector=collector)
+            if game.recorder:
+                replay = recorder.finish()
+                if manim_file:
+                    replay_source(manim_file, replay, cell_path=args.cell_graphic_path, flagged_path=args.flag_graphic_path,
+                                  mine_path=args.mine_graphic_path)
+            if collector:
+                collector.dump(profile_file)
             if args.step_by_step and args.play_count > 1:
                 input()
             if game.winning_state():
                 win_count += 1
             if args.verbosity < 1:
-                print(
-                    f"\r[{'=' * int(60 * (i + 1) / args.play_count)}{' ' * int(60 - 60 * (i + 1) / args.play_count)}] {'{:.1f}'.format((i + 1) / args.play_count * 100)}% ({'{:.1f}'.format(win_count / (i + 1) * 100)}%)",
-                    end="")
+                progress(i + 1, win_count)
     except KeyboardInterrupt:
         if args.verbosity < 1:
             print()
     print()
     print(f"Won {win_count} out of {i+1} games ({win_count / (i+1) * 100}%)")
+    if agent.patterns:
+        stats = agent.patterns.stats()
+        print(f"Pattern cache: {stats['hit_rate'] * 100:.1f}% of {stats['hits'] + stats['misses']} lookups reused, "
+              f"{stats['patterns']} patterns kept, {stats['evictions']} evicted")
     if manim_file:
         manim_file.close()
+    if replay_file:
+        replay_file.close()
+    if profile_file:
+        profile_file.close()
+
+
+def play_parallel(spec: GameSpec):
+    sink = ResultSink(args.results, resume=args.resume) if args.results else None
+    if sink and sink.first:
+        board_seed, agent_seed = game_seeds(args.board_seed, args.agent_seed, sink.first["game"])
+        if (board_seed, agent_seed) != (sink.first["board_seed"], sink.first["agent_seed"]) \
+                or (spec.rows, spec.columns, spec.mines) != (sink.first["rows"], sink.first["columns"], sink.first["mines"]):
+            print("The results file being resumed was played with a different seed or board")
+            sink.close()
+            return
+    played = sink.played if sink else 0
+    win_count = sink.win_count if sink else 0
+    remaining = [i for i in range(args.play_count) if not sink or i not in sink.done]
+    try:
+        for result in play_games(spec, args.board_seed, args.agent_seed, remaining, args.workers or 1):
+            played += 1
+            if result["won"]:
+                win_count += 1
+            if sink:
+                sink.write(result)
+            if args.verbosity < 1:
+                progress(played, win_count)
+    except KeyboardInterrupt:
+        if args.verbosity < 1:
+            print()
+    finally:
+        if sink:
+            sink.close()
+    print()
+    print(f"Won {win_count} out of {played} games ({win_count / max(played, 1) * 100}%)")
+
+
+def check_local(spec: GameSpec):
+    """
+    Plays each game on the server and then in this process with the same seeds,
+    reporting every game whose result, moves or guesses differ between the two.
+    """
+    results = []
+    for check_spec in (spec, spec._replace(server=None)):
+        results.append({result["game"]: result for result in
+                        play_games(check_spec, args.board_seed, args.agent_seed, range(args.play_count), args.workers or 1)})
+    remote, local = results
+    differ = [i for i in range(args.play_count)
+              if any(remote[i][key] != local[i][key] for key in ("won", "moves", "guesses"))]
+    for i in differ:
+        print(f"Game {i}: won {remote[i]['won']} in {remote[i]['moves']} moves on the server, "
+              f"won {local[i]['won']} in {local[i]['moves']} moves locally")
+    print(f"Won {sum(result['won'] for result in remote.values())} out of {args.play_count} games on the server and "
+          f"{sum(result['won'] for result in local.values())} locally, {len(differ)} played out differently")
+    if differ:
+        sys.exit(1)
+
+
+def play_sequential(spec: GameSpec):
+    """
+    Plays games a block at a time, seeded from the global seeds and their index as with --workers, checking after
+    each block whether the answer is known well enough to stop: the interval on each win rate being narrow enough,
+    or the agents being compared differing significantly.
+    """
+    confidence = args.confidence / 100
+    specs = [spec] if not args.compare_agent else [spec, spec._replace(agent=args.compare_agent)]
+    wins: list[dict[int, bool]] = [{} for _ in specs]
+    # every check of the comparison gets an equal share of the chance of a false positive, so stopping at the first
+    # significant one is no more likely to be wrong than a single test after every game has been played
+    checks = -(-args.play_count // args.check_every)
+    threshold = (1 - confidence) / checks
+    played = 0
+    p_value = None
+    stopped = None
+    # one pool for the whole run, as each worker keeps a game and agent for every spec it has played
+    pool = Pool(args.workers) if args.workers is not None and args.workers > 1 else None
+    try:
+        for start in range(0, args.play_count, args.check_every):
+            block = range(start, min(start + args.check_every, args.play_count))
+            for results, block_spec in zip(wins, specs):
+                for result in play_games(block_spec, args.board_seed, args.agent_seed, block, 1, pool):
+                    results[result["game"]] = result["won"]
+            played = len(block) + start
+            if args.verbosity < 1:
+                progress(played, sum(wins[0].values()))
+            if args.compare_agent:
+                only_a = sum(won and not wins[1][i] for i, won in wins[0].items())
+                only_b = sum(won and not wins[0][i] for i, won in wins[1].items())
+                p_value = mcnemar(only_a, only_b)
+                if p_value < threshold:
+                    stopped = "the difference between the agents is significant"
+                    break
+            if args.precision is not None and all(
+                    half_width(sum(results.values()), played, confidence) <= args.precision / 100 for results in wins):
+                stopped = f"the win rate is known to within {args.precision}%"
+                break
+    except KeyboardInterrupt:
+        if args.verbosity < 1:
+            print()
+        # only games from finished blocks are counted, so each agent has played the same ones
+        played = min(len(results) for results in wins) // args.check_every * args.check_every
+        wins = [{i: won for i, won in results.items() if i < played} for results in wins]
+    finally:
+        if pool is not None:
+            pool.terminate()
+    print()
+    for results, result_spec in zip(wins, specs):
+        win_count = sum(results.values())
+        low, high = wilson(win_count, played, confidence)
+        print(f"{result_spec.agent}: won {win_count} out of {played} games ({win_count / max(played, 1) * 100}%), "
+              f"{args.confidence}% interval {low * 100:.2f}% to {high * 100:.2f}%")
+    if p_value is not None:
+        print(f"McNemar p = {p_value:.4g}, significant below {threshold:.4g} at this many checks")
+    if stopped:
+        print(f"Stopped after {played} of {args.play_count} games as {stopped}, "
+              f"saving {(args.play_count - played) * len(specs)} games")
+    else:
+        print(f"Played {played} of {args.play_count} games without reaching an answer, saving none")
+
+
+def half_width(wins: int, games: int, confidence: float) -> float:
+    low, high = wilson(wins, games, confidence)
+    return (high - low) / 2
+
+
+def play_vectorised(spec: GameSpec):
+    played = 0
+    win_count = 0
+    agents = {"simple": VectorSimpleAgent, "set": VectorSetAgent}
+    try:
+        for index in range(0, args.play_count, args.batch_size):
+            board_seed, agent_seed = game_seeds(args.board_seed, args.agent_seed, index)
+            batch = MinesweeperBatch(min(args.batch_size, args.play_count - index), spec.rows, spec.columns, spec.mines,
+                                     board_seed, first_safe=spec.first_safe)
+            agents[spec.agent](batch, seed=agent_seed).play()
+            played += batch.board_count
+            win_count += int(batch.winning_state().sum())
+            if args.verbosity < 1:
+                progress(played, win_count)
+    except KeyboardInterrupt:
+        if args.verbosity < 1:
+            print()
+    print()
+    print(f"Won {win_count} out of {played} games ({win_count / max(played, 1) * 100}%)")
+
+
+def play_tiled(spec: GameSpec):
+    played = 0
+    win_count = 0
+    agents = {"simple": TileSimpleAgent, "set": TileSetAgent}
+    try:
+        for index in range(args.play_count):
+            board_seed, agent_seed = game_seeds(args.board_seed, args.agent_seed, index)
+            board = MinesweeperBatch(1, spec.rows, spec.columns, spec.mines, board_seed, first_safe=spec.first_safe)
+            agent = agents[spec.agent](board, seed=agent_seed, tile_size=args.tile_size, workers=args.workers)
+            start = perf_counter()
+            agent.play()
+            played += 1
+            win_count += int(board.winning_state()[0])
+            if args.verbosity >= 1:
+                print(f"Game {index}: {'won' if board.winning_state()[0] else 'lost'} in {perf_counter() - start:.2f}s, "
+                      f"deducing {agent.tiles_solved} of {agent.tiles_offered} tiles")
+            else:
+                progress(played, win_count)
+    except KeyboardInterrupt:
+        if args.verbosity < 1:
+            print()
+    print()
+    print(f"Won {win_count} out of {played} games ({win_count / max(played, 1) * 100}%)")
+
+
+def progress(played: int, win_count: int):
+    print(
+        f"\r[{'=' * int(60 * played / args.play_count)}{' ' * int(60 - 60 * played / args.play_count)}] {'{:.1f}'.format(played / args.play_count * 100)}% ({'{:.1f}'.format(win_count / played * 100)}%)",
+        end="")
 
 
 if __name__ == '__main__':
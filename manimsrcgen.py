@@ -1,12 +1,19 @@
-from game import Minesweeper
-from typing import IO
+from typing import IO, TYPE_CHECKING
+import numpy as np
 
+if TYPE_CHECKING:
+    from replay import Replay
 
-def agent_prelim(file: IO, game: Minesweeper, cell_path: str = None, flagged_path: str = None, mine_path: str = None):
+
+def scene_header(file: IO, board_seed: int = None, agent_seed: int = None):
+    file.write(f"from manim import *\nimport numpy as np\nclass S{hex(board_seed or 0)[2:]}{hex(agent_seed or 0)[2:]}(Scene):\n  def construct(self):\n    pass\n")
+
+
+def agent_prelim(file: IO, values: np.ndarray, cell_path: str = None, flagged_path: str = None, mine_path: str = None):
     cell_path = "./graphics/cell.svg" if cell_path is None else cell_path
     flagged_path = "./graphics/flagged.svg" if flagged_path is None else flagged_path
     mine_path = "./graphics/pressedmine.svg" if mine_path is None else mine_path
-    file.write(f"""    values = np.array({str(game.get_board()).replace(" ", ",")})
+    file.write(f"""    values = np.array({str(values).replace(" ", ",")})
     colors = [GREY, RED, GREEN, YELLOW, BLUE, PURPLE, LIGHT_BROWN, PINK, DARK_GREY]
     rows, cols = values.shape
     tile_size = min(7 / rows, 14 / cols)
@@ -24,6 +31,30 @@ def agent_prelim(file: IO, game: Minesweeper, cell_path: str = None, flagged_pat
 """)
 
 
+def agent_values(file: IO, values: np.ndarray):
+    # redraws the numbers under the cells, after first-safe has moved a mine
+    file.write(f"""    values = np.array({str(values).replace(" ", ",")})
+    self.remove(cell_nums)
+    cell_nums=Group(*(Text(str(v),color=colors[v],font_size=32/0.75*tile_size) if v<9 else mine_cell.copy() for v in values.flatten()))
+    for index in range(rows * cols): cell_nums[index].move_to(cell_grid[index])
+    self.bring_to_back(cell_nums)
+""")
+
+
+def agent_flags(file: IO, to_flag: list[tuple[int, int]]):
+    file.write(f"""    to_flag = {to_flag}
+    fg = AnimationGroup(*(Transform(cells[c[0] * cols + c[1]], flags[c[0] * cols + c[1]]) for c in to_flag))
+    self.play(fg)
+""")
+
+
+def agent_steps(file: IO, to_step: list[tuple[int, int]]):
+    file.write(f"""    to_step = {to_step}
+    sg = AnimationGroup(*(cells[c[0] * cols + c[1]].animate.set_fill(opacity=0.0) for c in to_step))
+    self.play(sg)
+""")
+
+
 def agent_term(file: IO):
     file.write("""    cell_grid.generate_target(True)
     cell_grid.target.shift(9 * UP)
@@ -31,3 +62,27 @@ def agent_term(file: IO):
     self.play(MoveToTarget(cell_grid), cells.animate.move_to(cell_grid.target), *(cell_nums[index].animate.move_to(cell_grid.target[index]) for index in range(rows * cols)))
     self.remove(cell_grid, cells, cell_nums)
 """)
+
+
+def replay_source(file: IO, replay: "Replay", cell_path: str = None, flagged_path: str = None, mine_path: str = None):
+    """
+    Writes the manim source animating a recorded game, one animation for the flags and one for the steps
+    of each pass of the agent's loop, the same as the agent used to write while it played.
+    """
+    agent_prelim(file, replay.state(0).values, cell_path=cell_path, flagged_path=flagged_path, mine_path=mine_path)
+    moves = 0
+    for events in replay.rounds():
+        to_flag = [cell for kind, cell in events if kind == "flag"]
+        to_step = []
+        if to_flag:
+            agent_flags(file, to_flag)
+        moves += len(to_flag)
+        for kind, cell in events:
+            if kind == "step":
+                to_step.append(cell)
+                moves += 1
+            elif kind == "relocate":
+                agent_values(file, replay.state(moves).values)
+        if to_step:
+            agent_steps(file, to_step)
+    agent_term(file)
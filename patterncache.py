@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from game import Minesweeper, iter_square
+
+
+# what a cell in a window can be, packed two bits a cell into a key
+OFF_BOARD = 0
+UNKNOWN = 1
+FLAGGED = 2
+STEPPED = 3
+NEIGHBOUR_OFFSETS = tuple((row, col) for row, col in iter_square(range(-1, 2)) if row or col)
+# the offset from one cell of a pair to the other, to the cells around either of them besides the pair itself
+PAIR_WINDOWS = {
+    (row, col): tuple(sorted(
+        {(r, c) for r, c in iter_square(range(-1, 2))} | {(row + r, col + c) for r, c in iter_square(range(-1, 2))}
+        - {(0, 0), (row, col)}
+    ))
+    for row, col in iter_square(range(-2, 3)) if row or col
+}
+PAIR_INDICES = {offset: index for index, offset in enumerate(PAIR_WINDOWS)}
+
+Deduction = tuple[tuple[tuple[int, int], ...], tuple[tuple[int, int], ...]]
+
+
+class PatternCache:
+    """
+    Remembers what primitive and pairwise deduced for each local pattern of values, flags and unknown cells,
+    as the steps and flags to make relative to the cell or pair, so a pattern seen before is just looked up.
+    Holds at most size patterns, dropping whichever was used longest ago to make room for new ones.
+    This is for measuring how much of the agents' local work repeats, not for speed: building a key reads
+    as many cells as the deduction it saves, so agents play slower with a cache than without one.
+    """
+
+    def __init__(self, size: int = 65536):
+        self.size = size
+        self.entries: OrderedDict[tuple, Deduction] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple) -> Deduction:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: tuple, entry: Deduction):
+        self.entries[key] = entry
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate(),
+            "patterns": len(self.entries),
+            "evictions": self.evictions,
+        }
+
+
+def window_key(game: Minesweeper, origin: tuple[int, int], offsets: tuple[tuple[int, int], ...]) -> int:
+    key = 0
+    for row, col in offsets:
+        cell = (origin[0] + row, origin[1] + col)
+        if not (0 <= cell[0] < game.row_count and 0 <= cell[1] < game.col_count):
+            state = OFF_BOARD
+        elif cell in game.stepped:
+            state = STEPPED
+        elif cell in game.flagged:
+            state = FLAGGED
+        else:
+            state = UNKNOWN
+        key = key << 2 | state
+    return key
+
+
+def primitive_key(game: Minesweeper, c: tuple[int, int]) -> tuple:
+    return game.cell_value(c), window_key(game, c, NEIGHBOUR_OFFSETS)
+
+
+def pair_key(game: Minesweeper, a: tuple[int, int], b: tuple[int, int]) -> tuple:
+    offset = (b[0] - a[0], b[1] - a[1])
+    return PAIR_INDICES[offset], game.cell_value(a), game.cell_value(b), window_key(game, a, PAIR_WINDOWS[offset])
+
+
+def to_offsets(cells: set[tuple[int, int]], origin: tuple[int, int]) -> tuple[tuple[int, int], ...]:
+    return tuple((cell[0] - origin[0], cell[1] - origin[1]) for cell in cells)
+
+
+def from_offsets(offsets: tuple[tuple[int, int], ...], origin: tuple[int, int]) -> set[tuple[int, int]]:
+    return {(origin[0] + row, origin[1] + col) for row, col in offsets}
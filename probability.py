@@ -0,0 +1,193 @@
+from time import perf_counter
+from math import comb
+from game import Minesweeper
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class Component:
+    """
+    The solutions to one independent part of the frontier, grouped by how many mines they place.
+    counts[k] is the number of solutions placing k mines, and cell_counts[k][i] how many of those have a mine at cells[i].
+    """
+
+    def __init__(self, cells: tuple[tuple[int, int], ...]):
+        self.cells = cells
+        self.counts: dict[int, int] = {}
+        self.cell_counts: dict[int, list[int]] = {}
+
+
+class ProbabilityEngine:
+    """
+    Works out the exact probability of each unknown cell being a mine, given everything visible on the board.
+    The frontier is split into independent components whose solutions are counted separately, then weighted
+    by the ways of placing the remaining mines in the cells away from the frontier.
+    Components which haven't changed since the last call are reused rather than counted again.
+    If counting takes longer than time_budget seconds, or a component has more than max_cells cells,
+    no probabilities are given so the caller can fall back on something cheaper.
+    """
+
+    def __init__(self, time_budget: float = None, max_cells: int = None):
+        self.time_budget = time_budget
+        self.max_cells = max_cells
+        self.cache: dict[tuple, Component] = {}
+        self.hits = 0
+        self.misses = 0
+        self._deadline: float = None
+        self._nodes = 0
+
+    def probabilities(self, game: Minesweeper) -> tuple[dict[tuple[int, int], float], float] | None:
+        """
+        Returns the mine probability of each unknown cell on the frontier, along with the probability shared
+        by every unknown cell away from it, or None if the budget was exceeded.
+        """
+        self._deadline = None if self.time_budget is None else perf_counter() + self.time_budget
+        keys = frontier(game)
+        components = []
+        cache = {}
+        try:
+            for key in keys:
+                if key in self.cache:
+                    self.hits += 1
+                    component = self.cache[key]
+                else:
+                    self.misses += 1
+                    component = self.solve(*key)
+                cache[key] = component
+                components.append(component)
+        except BudgetExceeded:
+            # what was counted before running out is kept for the next guess, along with anything from before
+            # that's still on the board but wasn't reached this time
+            cache.update((key, self.cache[key]) for key in keys if key in self.cache and key not in cache)
+            self.cache = cache
+            return None
+        # only components still on the board are worth keeping
+        self.cache = cache
+        others = game.tiles_remaining() - sum(len(component.cells) for component in components)
+        return combine(components, others, game.mines_remaining())
+
+    def solve(self, cells: tuple[tuple[int, int], ...], constraints: tuple) -> Component:
+        if self.max_cells is not None and len(cells) > self.max_cells:
+            raise BudgetExceeded()
+        component = Component(cells)
+        index = {cell: i for i, cell in enumerate(cells)}
+        # the constraints each cell takes part in, as indices into the lists below
+        involved = [[] for _ in cells]
+        needed = []
+        unassigned = []
+        for i, (constraint_cells, mines) in enumerate(constraints):
+            needed.append(mines)
+            unassigned.append(len(constraint_cells))
+            for c in constraint_cells:
+                involved[index[c]].append(i)
+        assignment = [False] * len(cells)
+
+        def record(mines: int):
+            if mines not in component.counts:
+                component.counts[mines] = 0
+                component.cell_counts[mines] = [0] * len(cells)
+            component.counts[mines] += 1
+            counts = component.cell_counts[mines]
+            for i, mine in enumerate(assignment):
+                if mine:
+                    counts[i] += 1
+
+        def search(i: int, mines: int):
+            self._nodes += 1
+            if self._deadline is not None and self._nodes % 1024 == 0 and perf_counter() > self._deadline:
+                raise BudgetExceeded()
+            if i == len(cells):
+                record(mines)
+                return
+            for mine in (False, True):
+                feasible = True
+                for c in involved[i]:
+                    unassigned[c] -= 1
+                    if mine:
+                        needed[c] -= 1
+                    if needed[c] < 0 or needed[c] > unassigned[c]:
+                        feasible = False
+                if feasible:
+                    assignment[i] = mine
+                    search(i + 1, mines + mine)
+                for c in involved[i]:
+                    unassigned[c] += 1
+                    if mine:
+                        needed[c] += 1
+            assignment[i] = False
+
+        search(0, 0)
+        return component
+
+
+def frontier(game: Minesweeper) -> list[tuple]:
+    """
+    Splits the constraints given by stepped on cells into independent components,
+    each described by its sorted cells and its sorted (cells, mines) constraints.
+    """
+    constraints = {}
+    for cell in game.border:
+        unknown = game.neighbours(cell) & game.frontier
+        if unknown:
+            constraints[frozenset(unknown)] = game.cell_value(cell) - len(game.neighbours(cell) & game.flagged)
+    # union find over cells sharing a constraint
+    parent = {}
+
+    def find(c):
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
+
+    for cells in constraints:
+        for c in cells:
+            parent.setdefault(c, c)
+        first, *rest = cells
+        for c in rest:
+            parent[find(c)] = find(first)
+    groups: dict[tuple[int, int], list] = {}
+    for cells, mines in constraints.items():
+        groups.setdefault(find(next(iter(cells))), []).append((tuple(sorted(cells)), mines))
+    keys = []
+    for root, group in groups.items():
+        cells = tuple(sorted({c for cs, _ in group for c in cs}))
+        keys.append((cells, tuple(sorted(group))))
+    return keys
+
+
+def combine(components: list[Component], others: int, mines: int) -> tuple[dict[tuple[int, int], float], float]:
+    """
+    Weights every combination of component solutions by the ways of placing the leftover mines among
+    the other unknown cells, giving the probability of each frontier cell and of each other cell being a mine.
+    """
+
+    def convolve(parts: list[Component]) -> dict[int, int]:
+        # ways of placing each total number of mines across the given components
+        totals = {0: 1}
+        for part in parts:
+            new_totals = {}
+            for total, ways in totals.items():
+                for k, count in part.counts.items():
+                    new_totals[total + k] = new_totals.get(total + k, 0) + ways * count
+            totals = new_totals
+        return totals
+
+    everything = convolve(components)
+    weight = sum(ways * comb(others, mines - total) for total, ways in everything.items() if 0 <= mines - total <= others)
+    if weight == 0:
+        # nothing consistent with the visible board, which only happens if a flag was wrong
+        return {}, mines / others if others else 0.0
+    leftover = sum(ways * comb(others, mines - total) * (mines - total) for total, ways in everything.items() if 0 <= mines - total <= others)
+    probabilities = {}
+    for j, component in enumerate(components):
+        rest = convolve(components[:j] + components[j + 1:])
+        cell_weights = [0] * len(component.cells)
+        for k, counts in component.cell_counts.items():
+            arrangements = sum(ways * comb(others, mines - k - total) for total, ways in rest.items() if 0 <= mines - k - total <= others)
+            for i, count in enumerate(counts):
+                cell_weights[i] += count * arrangements
+        for cell, cell_weight in zip(component.cells, cell_weights):
+            probabilities[cell] = cell_weight / weight
+    return probabilities, leftover / weight / others if others else 0.0
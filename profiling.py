@@ -0,0 +1,59 @@
+from typing import IO
+import json
+
+
+class PhaseStats:
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0
+        self.iterations = 0
+        self.deductions = 0
+        self.frontier_total = 0
+        self.frontier_max = 0
+
+    def export(self) -> dict:
+        return {
+            "calls": self.calls,
+            "time": self.time,
+            "iterations": self.iterations,
+            "deductions": self.deductions,
+            "frontier_mean": self.frontier_total / self.calls if self.calls else 0.0,
+            "frontier_max": self.frontier_max,
+        }
+
+
+class PhaseCollector:
+    """
+    Collects how long an agent spends in each phase of its play, passed to play as collector.
+    Each call to record is one pass through a phase: how long it took, how many cells or pairs it went through,
+    how big the frontier was at the time, and how many steps or flags it deduced.
+    Agents check whether they were given a collector before timing anything, so there's no cost without one.
+    """
+
+    def __init__(self):
+        self.phases: dict[str, PhaseStats] = {}
+        self.games: list[dict] = []
+
+    def start_game(self):
+        self.phases = {}
+
+    def record(self, phase: str, time: float, iterations: int = 1, frontier: int = 0, deductions: int = 0):
+        if phase not in self.phases:
+            self.phases[phase] = PhaseStats()
+        stats = self.phases[phase]
+        stats.calls += 1
+        stats.time += time
+        stats.iterations += iterations
+        stats.deductions += deductions
+        stats.frontier_total += frontier
+        stats.frontier_max = max(stats.frontier_max, frontier)
+
+    def end_game(self, **info):
+        self.games.append(dict(info, phases={name: stats.export() for name, stats in self.phases.items()}))
+
+    def dump(self, f: IO):
+        # one JSON object per game, as lines
+        for game in self.games:
+            f.write(json.dumps(game) + "\n")
+        self.games.clear()
@@ -0,0 +1,145 @@
+from typing import Iterable
+from game import Minesweeper
+import socket
+
+
+class RemoteError(Exception):
+    pass
+
+
+class GameConnection:
+    """
+    A blocking connection to a GameServer, at 'host:port' or the file location of a unix socket.
+    Sends commands a line at a time and reads back the line of replies to them.
+    """
+
+    def __init__(self, address: str):
+        host, _, port = address.rpartition(":")
+        if host and port.isdigit():
+            self.socket = socket.create_connection((host, int(port)))
+            # lines are small and each waits on its reply, so there's nothing to gain from holding them back
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(address)
+        self.file = self.socket.makefile("rwb")
+
+    def send(self, *commands: str) -> list[str]:
+        self.file.write((";".join(commands) + "\n").encode())
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise RemoteError("The server closed the connection")
+        replies = line.decode().rstrip("\n").split(";")
+        for reply in replies:
+            if reply.startswith("ERR"):
+                raise RemoteError(reply[4:])
+        return replies
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+class RemoteMinesweeper(Minesweeper):
+    """
+    A game played on a GameServer, which agents can play just as they would a Minesweeper.
+    The mines are laid here as Minesweeper lays them, from this game's random, so a seed gives the same boards
+    whether they're played locally or remotely. The game only starts on the server with the first step, once
+    first-safe has moved any mine from under it, and is sent the mines to play with. Everything revealed is as
+    the server replies, with the border, frontier and counters kept up to date here as usual.
+    Flags are held back and sent along with the next step or state check, so each step is one round trip.
+    """
+
+    def __init__(self, connection: GameConnection, rows: int, columns: int, mines: int, seed=None, first_safe=False):
+        self.connection = connection
+        self.id: int = None
+        # the last game, ended on the server along with starting the next one to save a round trip
+        self._ended: int = None
+        self._pending: list[tuple[int, int]] = []
+        super().__init__(rows, columns, mines, seed=seed, first_safe=first_safe)
+
+    def reset(self, mines: Iterable[tuple[int, int]] = None):
+        super().reset(mines)
+        if self.id is not None:
+            self._ended = self.id
+            self.id = None
+        self._pending = []
+
+    def start(self, cell: tuple[int, int]):
+        if self._ignore_mine and cell in self._mines:
+            # stepped on before the mine is moved as in Minesweeper.step, so it moves to the same place
+            unknown = cell not in self.flagged
+            self.stepped.add(cell)
+            self._known(cell, unknown)
+            self.relocate(cell)
+        commands = [f"END {self._ended}"] if self._ended is not None else []
+        commands.append(f"NEW {self.row_count} {self.col_count} {self.mine_count} 0 0 "
+                        + " ".join(f"{row},{col}" for row, col in self._mines))
+        self.id = int(self.connection.send(*commands)[-1].split()[1])
+        self._ended = None
+
+    def send(self, command: str) -> str:
+        # any flags held back go first, in the same round trip
+        commands = [command]
+        if self._pending:
+            commands.insert(0, f"FLAG {self.id} " + " ".join(f"{row},{col}" for row, col in self._pending))
+            self._pending = []
+        return self.connection.send(*commands)[-1]
+
+    def winning_state(self):
+        if self._exploded or self.id is None:
+            return super().winning_state()
+        return self.send(f"STATE {self.id}").split()[1] == "won"
+
+    def step(self, cell: tuple[int, int]) -> int:
+        if self.id is None:
+            self.start(cell)
+        return self.reveal(self.send(f"STEP {self.id} {cell[0]},{cell[1]}"))[cell]
+
+    def step_region(self, cell: tuple[int, int]) -> dict[tuple[int, int], int]:
+        if self.id is None:
+            self.start(cell)
+        return self.reveal(self.send(f"OPEN {self.id} {cell[0]},{cell[1]}"))
+
+    def reveal(self, reply: str) -> dict[tuple[int, int], int]:
+        status, *words = reply.split()
+        revealed = {}
+        for word in words[1:] if status == "BOOM" else words:
+            row, col, value = (int(part) for part in word.split(","))
+            revealed[row, col] = value
+        for cell, value in revealed.items():
+            unknown = cell not in self.stepped and cell not in self.flagged
+            self.stepped.add(cell)
+            self._values[cell] = value
+            self._known(cell, unknown)
+        if status == "BOOM":
+            cell = tuple(int(part) for part in words[0].split(","))
+            # counted as known before it's stepped on, so the mine's value never joins the border
+            self._known(cell, cell not in self.stepped and cell not in self.flagged)
+            self.stepped.add(cell)
+            self._exploded = True
+            raise ValueError("Boom!")
+        self._ignore_mine = False
+        return revealed
+
+    def flag(self, cell: tuple[int, int]) -> bool:
+        if cell in self.stepped:
+            return False
+        if cell not in self.flagged:
+            self._pending.append(cell)
+            self.flagged.add(cell)
+            self._known(cell, True)
+        return True
+
+    def mines_remaining(self):
+        # the agents only flag cells they've deduced are mines, so every flag counts
+        return self.mine_count - len(self.flagged)
+
+    def close(self):
+        commands = [f"END {game_id}" for game_id in (self._ended, self.id) if game_id is not None]
+        if commands:
+            self.connection.send(*commands)
+        self.id = None
+        self._ended = None
+        self._pending = []
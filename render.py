@@ -0,0 +1,94 @@
+STYLES = ("\x1b[103m", "\x1b[4m", "\x1b[1m", "\x1b[3m")
+
+
+class TerminalRenderer:
+    """
+    Draws a game board to the terminal, building each frame in one string and printing it all at once.
+    Cell text is cached by what the cell shows and how it's styled.
+    With incremental set, frames after the first only rewrite the cells which changed since the last frame,
+    moving the cursor back up to them with escape sequences, so nothing else should be printed between frames.
+    """
+
+    def __init__(self, incremental: bool = False):
+        self.incremental = incremental
+        self._cells: dict[tuple, str] = {}
+        self._last: list[list[str]] = None
+        # lines printed since the top of the last frame
+        self._height = 0
+
+    def invalidate(self):
+        # the next frame is drawn in full, such as after anything else has been printed
+        self._last = None
+
+    def cell(self, kind: str, value: int, coloured: bool, styles: tuple[bool, ...]) -> str:
+        key = (kind, value, coloured, styles)
+        if key not in self._cells:
+            prefix = "".join(style for style, on in zip(STYLES, styles) if on)
+            match kind:
+                case "X" | "F" | "M":
+                    colour = "\x1b[94m" if kind == "F" else "\x1b[91m"
+                    text = f"{colour}{kind}\x1b[m " if coloured else f"{kind} "
+                case "#":
+                    text = "# "
+                case _:
+                    text = f"\x1b[3{value}m{value}\x1b[m " if coloured else f"{value} "
+            # styles are closed off so they can't run on into the following cells
+            if prefix and not text.endswith("\x1b[m "):
+                text = text[:-1] + "\x1b[m "
+            self._cells[key] = prefix + text
+        return self._cells[key]
+
+    def frame(self, game, mines: set[tuple[int, int]], show_mines: bool, coloured: bool,
+              styled: tuple[set[tuple[int, int]], ...]) -> list[list[str]]:
+        rows = []
+        for row in range(game.row_count):
+            line = []
+            for col in range(game.col_count):
+                cell = (row, col)
+                styles = tuple(cell in cells for cells in styled)
+                value = 0
+                if cell in game.stepped:
+                    if cell in mines:
+                        kind = "X"
+                    else:
+                        kind = "value"
+                        value = game.cell_value(cell)
+                elif cell in game.flagged:
+                    kind = "F"
+                elif show_mines and cell in mines:
+                    kind = "M"
+                else:
+                    kind = "#"
+                line.append(self.cell(kind, value, coloured, styles))
+            rows.append(line)
+        return rows
+
+    def draw(self, game, mines: set[tuple[int, int]], **kwargs):
+        show_mines = kwargs['show_mines'] if "show_mines" in kwargs.keys() else False
+        coloured = kwargs['coloured'] if 'coloured' in kwargs.keys() else False
+        end = kwargs['end'] if 'end' in kwargs.keys() else "\n"
+        styled = tuple(as_set(kwargs[style] if style in kwargs.keys() else None)
+                       for style in ("highlighted", "underlined", "bold", "italic"))
+        frame = self.frame(game, mines, show_mines, coloured, styled)
+        last = self._last
+        if self.incremental and last is not None and len(last) == len(frame) and len(last[0]) == len(frame[0]):
+            buffer = []
+            for row, (line, last_line) in enumerate(zip(frame, last)):
+                for col, (text, last_text) in enumerate(zip(line, last_line)):
+                    if text != last_text:
+                        up = self._height - row
+                        buffer.append(f"\x1b[{up}A\x1b[{2 * col + 1}G{text}\x1b[{up}B\r")
+            print("".join(buffer), end="", flush=True)
+        else:
+            print("\n".join("".join(line) for line in frame), end="\n" + end, flush=True)
+            self._height = len(frame) + end.count("\n")
+        self._last = frame
+
+
+def as_set(cells) -> set[tuple[int, int]]:
+    # styles can be given as a single cell or a list of them
+    if cells is None:
+        return set()
+    if cells.__class__ is not list:
+        return {cells}
+    return set(cells)
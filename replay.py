@@ -0,0 +1,238 @@
+from typing import IO, Iterator, NamedTuple
+import argparse
+import struct
+import sys
+import numpy as np
+from vectorgame import neighbour_sum
+from manimsrcgen import scene_header, replay_source
+
+MAGIC = b"MSRP"
+VERSION = 1
+# magic, version, which seeds are known, rows, columns, mines, board seed, agent seed, game index, event count
+HEADER = struct.Struct("<4sBBIIIQQII")
+# each event is a 32 bit word, the top two bits saying what happened and the rest which cell it happened to
+STEP = 0
+FLAG = 1
+# the mine under the cell just stepped on was moved to this cell by first-safe
+RELOCATE = 2
+# the agent finished one pass of its loop, used to group moves together when animating
+ROUND = 3
+KINDS = {STEP: "step", FLAG: "flag", RELOCATE: "relocate"}
+CELL_BITS = 30
+CELL_MASK = (1 << CELL_BITS) - 1
+SEED_MASK = (1 << 64) - 1
+
+
+class ReplayState(NamedTuple):
+    stepped: np.ndarray
+    flagged: np.ndarray
+    mines: np.ndarray
+    # the number of mines around each cell, with 9 for the mines themselves, as from Minesweeper.get_board
+    values: np.ndarray
+
+
+class Replay:
+    """
+    One recorded game: the board's dimensions, where the mines started out and every event in the order it happened.
+    Events are kept packed in a uint32 array, which is also how they're stored on disk.
+    """
+
+    def __init__(self, rows: int, columns: int, mine_count: int, mines: np.ndarray, events: np.ndarray,
+                 board_seed: int = None, agent_seed: int = None, index: int = 0):
+        self.rows = rows
+        self.columns = columns
+        self.mine_count = mine_count
+        self.mines = mines
+        self.events = events
+        self.board_seed = board_seed
+        self.agent_seed = agent_seed
+        self.index = index
+
+    def __len__(self) -> int:
+        # the number of moves made, not counting relocations or round markers
+        return int(np.count_nonzero(self.events >> CELL_BITS <= FLAG))
+
+    def cell(self, index: int) -> tuple[int, int]:
+        return divmod(int(index), self.columns)
+
+    def state(self, moves: int = None) -> ReplayState:
+        """
+        The board as it was after the given number of steps and flags, or at the end of the game if not given.
+        """
+        events = self.events
+        if moves is not None:
+            positions = np.flatnonzero(events >> CELL_BITS <= FLAG)
+            # anything following the last move counted, such as the relocation it caused, is kept
+            events = events[:positions[moves]] if moves < len(positions) else events
+        kinds = events >> CELL_BITS
+        cells = (events & CELL_MASK).astype(np.int64)
+        stepped = np.zeros(self.rows * self.columns, dtype=bool)
+        flagged = np.zeros(self.rows * self.columns, dtype=bool)
+        mines = self.mines.reshape(-1).copy()
+        stepped[cells[kinds == STEP]] = True
+        flagged[cells[kinds == FLAG]] = True
+        # relocations happen at most once a game, each straight after the step that set it off
+        for position in np.flatnonzero(kinds == RELOCATE):
+            mines[cells[position - 1]] = False
+            mines[cells[position]] = True
+        shape = (self.rows, self.columns)
+        mines = mines.reshape(shape)
+        values = neighbour_sum(mines.astype(np.int8))
+        values[mines] = 9
+        return ReplayState(stepped.reshape(shape), flagged.reshape(shape), mines, values)
+
+    def rounds(self) -> Iterator[list[tuple[str, tuple[int, int]]]]:
+        # the events between each round marker, as ("step" | "flag" | "relocate", cell) pairs
+        current = []
+        for event in self.events.tolist():
+            kind = event >> CELL_BITS
+            if kind == ROUND:
+                if current:
+                    yield current
+                current = []
+            else:
+                current.append((KINDS[kind], self.cell(event & CELL_MASK)))
+        if current:
+            yield current
+
+    def write(self, file: IO):
+        seeds = (self.board_seed is not None) | (self.agent_seed is not None) << 1
+        file.write(HEADER.pack(MAGIC, VERSION, seeds, self.rows, self.columns, self.mine_count,
+                               (self.board_seed or 0) & SEED_MASK, (self.agent_seed or 0) & SEED_MASK,
+                               self.index, len(self.events)))
+        file.write(np.packbits(self.mines.reshape(-1)).tobytes())
+        file.write(self.events.astype("<u4").tobytes())
+
+
+def read_replays(file: IO) -> Iterator[Replay]:
+    while True:
+        header = file.read(HEADER.size)
+        if not header:
+            return
+        if len(header) < HEADER.size:
+            raise ValueError("Replay file ends part way through a game")
+        magic, version, seeds, rows, columns, mine_count, board_seed, agent_seed, index, event_count = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a replay file, or one from another version")
+        cells = rows * columns
+        mines = np.unpackbits(np.frombuffer(file.read(-(-cells // 8)), dtype=np.uint8), count=cells).astype(bool)
+        events = np.frombuffer(file.read(4 * event_count), dtype="<u4").astype(np.uint32)
+        yield Replay(rows, columns, mine_count, mines.reshape(rows, columns), events,
+                     board_seed if seeds & 1 else None, agent_seed if seeds & 2 else None, index)
+
+
+class ReplayRecorder:
+    """
+    Records the games played on a board, set as the game's recorder. The game tells it about each reset, step,
+    flag and relocation, and agents mark the end of each pass of their loop.
+    Each game is finished off as a Replay when the next one starts or finish is called,
+    and written to file if one was given.
+    Seeds are only stored to say where the games came from, as the mines are stored in full.
+    """
+
+    def __init__(self, file: IO = None, board_seed: int = None, agent_seed: int = None):
+        self.file = file
+        # seeds outside 64 bits can't be stored, so they're left out
+        self.board_seed = board_seed if board_seed is not None and 0 <= board_seed <= SEED_MASK else None
+        self.agent_seed = agent_seed if agent_seed is not None and 0 <= agent_seed <= SEED_MASK else None
+        self.games = 0
+        self._game = None
+        self._mines: np.ndarray = None
+        self._events: list[int] = []
+
+    def start(self, game):
+        if self._game is not None:
+            self.finish()
+        self._game = game
+        mines = np.zeros(game.row_count * game.col_count, dtype=bool)
+        mines[np.array([row * game.col_count + col for row, col in game._mines], dtype=np.int64)] = True
+        self._mines = mines.reshape(game.row_count, game.col_count)
+        self._events = []
+
+    def step(self, cell: tuple[int, int]):
+        self._events.append(STEP << CELL_BITS | cell[0] * self._game.col_count + cell[1])
+
+    def flag(self, cell: tuple[int, int]):
+        self._events.append(FLAG << CELL_BITS | cell[0] * self._game.col_count + cell[1])
+
+    def relocate(self, cell: tuple[int, int]):
+        self._events.append(RELOCATE << CELL_BITS | cell[0] * self._game.col_count + cell[1])
+
+    def round(self):
+        if self._events and self._events[-1] != ROUND << CELL_BITS:
+            self._events.append(ROUND << CELL_BITS)
+
+    def finish(self) -> Replay:
+        game = self._game
+        replay = Replay(game.row_count, game.col_count, game.mine_count, self._mines, np.array(self._events, dtype=np.uint32),
+                        self.board_seed, self.agent_seed, self.games)
+        if self.file:
+            replay.write(self.file)
+        self.games += 1
+        self._game = None
+        return replay
+
+
+def init():
+    global args
+    parser = argparse.ArgumentParser(description="Look through or animate recorded games of minesweeper")
+    parser.add_argument("replay",
+                        help="File location of the recorded games")
+    parser.add_argument("-g", "--game",
+                        help="The index of the game in the file to look at, otherwise every game is listed",
+                        type=int,
+                        default=None)
+    parser.add_argument("--moves",
+                        help="Show the board after this many steps and flags of the game, otherwise at the end",
+                        type=int,
+                        default=None)
+    parser.add_argument("--manim-src",
+                        help="File location to write manimation source for the game, or every game if none is chosen",
+                        default=None)
+    parser.add_argument("--cell-graphic-path",
+                        help="File location for cell graphic used in the generated manimation source file.",
+                        default=None)
+    parser.add_argument("--flag-graphic-path",
+                        help="File location for the flagged cell graphic used in the generated manimation source file.",
+                        default=None)
+    parser.add_argument("--mine-graphic-path",
+                        help="File location for the mine graphic used in the generated manimation source file.",
+                        default=None)
+    args = parser.parse_args()
+
+
+def main():
+    with open(args.replay, 'rb') as f:
+        replays = [replay for replay in read_replays(f) if args.game is None or replay.index == args.game]
+    if not replays:
+        sys.exit(f"No game {args.game} in {args.replay}" if args.game is not None else f"No games in {args.replay}")
+    if args.manim_src:
+        with open(args.manim_src, 'w') as f:
+            scene_header(f, replays[0].board_seed, replays[0].agent_seed)
+            for replay in replays:
+                replay_source(f, replay, cell_path=args.cell_graphic_path, flagged_path=args.flag_graphic_path,
+                              mine_path=args.mine_graphic_path)
+        return
+    for replay in replays:
+        state = replay.state(args.moves)
+        if (state.stepped & state.mines).any():
+            outcome = "lost"
+        elif (state.flagged & state.mines).sum() == replay.mine_count:
+            outcome = "won"
+        else:
+            outcome = "unfinished"
+        print(f"Game {replay.index}: {replay.rows}x{replay.columns} with {replay.mine_count} mines, "
+              f"{len(replay)} moves, {outcome}")
+        if args.game is not None:
+            for row in range(replay.rows):
+                print("".join(
+                    ("X " if state.mines[row, col] else f"{state.values[row, col]} ") if state.stepped[row, col]
+                    else "F " if state.flagged[row, col] else "# "
+                    for col in range(replay.columns)
+                ))
+
+
+if __name__ == '__main__':
+    args: argparse.Namespace
+    init()
+    main()
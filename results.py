@@ -0,0 +1,48 @@
+import json
+import os
+
+
+class ResultSink:
+    """
+    Appends one line of JSON per game played to a file, flushing as it goes so a killed run loses at most one game.
+    When resuming, the games already in the file are counted up so they can be skipped,
+    and any partly written line left by a killed run is cut off.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.done: set[int] = set()
+        self.played = 0
+        self.win_count = 0
+        # kept to check a resumed run is playing the same games as before
+        self.first: dict = None
+        if resume and os.path.exists(path):
+            self._load()
+            self.file = open(path, 'a')
+        else:
+            self.file = open(path, 'w')
+
+    def _load(self):
+        with open(self.path, 'rb+') as f:
+            data_end = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self.record(json.loads(line))
+                data_end += len(line)
+            f.truncate(data_end)
+
+    def record(self, result: dict):
+        if self.first is None:
+            self.first = result
+        self.done.add(result["game"])
+        self.played += 1
+        self.win_count += result["won"]
+
+    def write(self, result: dict):
+        self.record(result)
+        self.file.write(json.dumps(result) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
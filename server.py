@@ -0,0 +1,223 @@
+from collections import OrderedDict
+from itertools import count
+from random import Random
+from game import Minesweeper
+from batch import GAMES
+import argparse
+import asyncio
+
+# the most cells a client can ask for in one game, small enough that building one holds up the other clients
+# for no more than a few tens of milliseconds, as every game is held and built in this one process
+MAX_CELLS = 1 << 12
+# how many ended games are kept to be reset for each size, and how many sizes are kept, the least recent dropped
+SPARE_GAMES = 4
+SPARE_SIZES = 16
+
+
+class GameServer:
+    """
+    Hosts any number of games of minesweeper for clients connected over a socket, using a line based protocol.
+    Each line holds one or more commands separated by ';', and is answered by one line holding a reply to each,
+    so a client can make a whole set of moves in one round trip. Cells are written as 'row,col'.
+
+        NEW rows columns mines [first_safe [seed [cell...]]]  ->  GAME id
+        STEP id cell...                                       ->  OK row,col,value...  or  BOOM cell row,col,value...
+        OPEN id cell...                                       ->  the same, stepping through zeros as Minesweeper.step_region
+        FLAG id cell...                                       ->  OK
+        STATE id                                              ->  STATE playing|won|lost mines_remaining tiles_remaining
+        END id                                                ->  OK
+
+    A new game's mines are laid at the cells given, or otherwise at random from the seed.
+    Stepping stops at the first mine, whose cell is given after BOOM along with the cells revealed before it.
+    Anything wrong with a command is answered with ERR and a message, without making any of its moves.
+    Games are ended when the connection which started them closes, and a few of each size are kept to be reset
+    for the next game of that size, as building a board's lookup tables costs more than a reset.
+    """
+
+    def __init__(self, backend: str = "set", seed=None, max_cells: int = MAX_CELLS):
+        self.game_class = GAMES[backend]
+        self.random = Random(seed)
+        self.max_cells = max_cells
+        self.games: dict[int, Minesweeper] = {}
+        self.spare: OrderedDict[tuple, list[Minesweeper]] = OrderedDict()
+        self.ids = count()
+        self.commands = {
+            "NEW": self.new,
+            "STEP": self.step,
+            "OPEN": self.open,
+            "FLAG": self.flag,
+            "STATE": self.state,
+            "END": self.end,
+        }
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        owned: set[int] = set()
+        try:
+            while line := await reader.readline():
+                replies = []
+                # anything not text is replaced, so it's answered with an error like any other bad command
+                for text in line.decode(errors="replace").split(";"):
+                    replies.append(self.command(text, owned))
+                    # other clients get their turn between each command of a long line
+                    await asyncio.sleep(0)
+                writer.write((";".join(replies) + "\n").encode())
+                await writer.drain()
+        except ValueError:
+            # the line was longer than the reader's limit
+            writer.write(b"ERR the line is too long\n")
+        except ConnectionError:
+            pass
+        finally:
+            for game_id in list(owned):
+                self.end([str(game_id)], owned)
+            writer.close()
+
+    def command(self, text: str, owned: set[int]) -> str:
+        name, *words = text.split() or [""]
+        if name.upper() not in self.commands:
+            return f"ERR unknown command {name!r}"
+        try:
+            return self.commands[name.upper()](words, owned)
+        except (ValueError, IndexError) as e:
+            return f"ERR {e}"
+
+    def new(self, words: list[str], owned: set[int]) -> str:
+        rows, columns, mines = (int(word) for word in words[:3])
+        first_safe = len(words) > 3 and words[3] == "1"
+        seed = int(words[4]) if len(words) > 4 else self.random.getrandbits(64)
+        if rows < 1 or columns < 1 or rows * columns > self.max_cells:
+            raise ValueError(f"boards need between 1 and {self.max_cells} cells")
+        if not 0 <= mines < rows * columns:
+            raise ValueError("there needs to be at least one cell without a mine")
+        layout = self.cells(rows, columns, words[5:]) or None
+        if layout is not None and len(set(layout)) != mines:
+            raise ValueError(f"the mines need {mines} different cells")
+        key = rows, columns, mines, first_safe
+        if self.spare.get(key):
+            game = self.spare[key].pop()
+            self.spare.move_to_end(key)
+            game.random.seed(seed)
+            game.reset(layout)
+        else:
+            game = self.game_class(rows, columns, mines, seed, first_safe=first_safe)
+            if layout is not None:
+                game.reset(layout)
+        game_id = next(self.ids)
+        self.games[game_id] = game
+        owned.add(game_id)
+        return f"GAME {game_id}"
+
+    def game(self, word: str, owned: set[int]) -> Minesweeper:
+        # clients can only play the games they started
+        if int(word) not in owned:
+            raise ValueError(f"no game {word} on this connection")
+        return self.games[int(word)]
+
+    def cells(self, rows: int, columns: int, words: list[str]) -> list[tuple[int, int]]:
+        cells = []
+        for word in words:
+            row, col = (int(part) for part in word.split(","))
+            if not (0 <= row < rows and 0 <= col < columns):
+                raise ValueError(f"{word} is off the board")
+            cells.append((row, col))
+        return cells
+
+    def step(self, words: list[str], owned: set[int], region: bool = False) -> str:
+        game = self.game(words[0], owned)
+        if game._exploded:
+            raise ValueError("the game is over")
+        revealed = []
+        for cell in self.cells(game.row_count, game.col_count, words[1:]):
+            try:
+                if region:
+                    revealed.extend(game.step_region(cell).items())
+                else:
+                    revealed.append((cell, game.step(cell)))
+            except ValueError:
+                return " ".join([f"BOOM {cell[0]},{cell[1]}"] + [f"{r},{c},{value}" for (r, c), value in revealed])
+        return " ".join(["OK"] + [f"{r},{c},{value}" for (r, c), value in revealed])
+
+    def open(self, words: list[str], owned: set[int]) -> str:
+        return self.step(words, owned, region=True)
+
+    def flag(self, words: list[str], owned: set[int]) -> str:
+        game = self.game(words[0], owned)
+        for cell in self.cells(game.row_count, game.col_count, words[1:]):
+            game.flag(cell)
+        return "OK"
+
+    def state(self, words: list[str], owned: set[int]) -> str:
+        game = self.game(words[0], owned)
+        status = "lost" if game._exploded else "won" if game.winning_state() else "playing"
+        return f"STATE {status} {game.mines_remaining()} {game.tiles_remaining()}"
+
+    def end(self, words: list[str], owned: set[int]) -> str:
+        game = self.game(words[0], owned)
+        owned.discard(int(words[0]))
+        del self.games[int(words[0])]
+        key = game.row_count, game.col_count, game.mine_count, game.first_safe
+        spares = self.spare.pop(key, [])
+        if len(spares) < SPARE_GAMES:
+            spares.append(game)
+        # put back as the most recently used size
+        self.spare[key] = spares
+        if len(self.spare) > SPARE_SIZES:
+            self.spare.popitem(last=False)
+        return "OK"
+
+
+def init():
+    global args
+    parser = argparse.ArgumentParser(description="Host games of minesweeper for agents playing over a socket")
+    parser.add_argument("--host",
+                        help="The address to listen on",
+                        default="127.0.0.1")
+    parser.add_argument("-p", "--port",
+                        help="The port to listen on",
+                        type=int,
+                        default=7878)
+    parser.add_argument("--unix",
+                        help="File location of a unix socket to listen on instead of a port",
+                        default=None)
+    parser.add_argument("-b", "--backend",
+                        help="Specify how the state of each game is stored",
+                        choices=["set", "bit", "sparse"],
+                        default="set")
+    parser.add_argument("-s", "--seed",
+                        help="Specify the seed for games started without one",
+                        type=int,
+                        default=None)
+    parser.add_argument("--max-cells",
+                        help="The most cells allowed in one game",
+                        type=int,
+                        default=MAX_CELLS)
+    args = parser.parse_args()
+
+
+def line_limit(max_cells: int) -> int:
+    # long enough for a NEW laying a mine on every cell of the largest board
+    return max(1 << 16, 16 * max_cells)
+
+
+async def serve():
+    server = GameServer(args.backend, args.seed, args.max_cells)
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.handle, args.unix, limit=line_limit(args.max_cells))
+    else:
+        listener = await asyncio.start_server(server.handle, args.host, args.port, limit=line_limit(args.max_cells))
+    print(f"Listening on {args.unix or f'{args.host}:{args.port}'}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    args: argparse.Namespace
+    init()
+    main()
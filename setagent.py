@@ -1,13 +1,75 @@
-from itertools import combinations
+from typing import Iterator
+from time import perf_counter
 from simpleagent import SimpleAgent
-from game import Minesweeper
-from manimsrcgen import agent_prelim, agent_term
+from game import Minesweeper, iter_square
+from probability import ProbabilityEngine
+from profiling import PhaseCollector
+from patterncache import PatternCache, pair_key, to_offsets, from_offsets
+
+
+class PairIndex:
+    """
+    The cells used for pairwise search, keeping track of which of them have had a neighbour stepped on or flagged
+    since they were last paired up, so that only pairs involving those need checking again.
+    Behaves as the set of cells for everything besides pairing.
+    """
+
+    def __init__(self, agent: "SetAgent"):
+        self.agent = agent
+        self.cells: set[tuple[int, int]] = set()
+        self.changed: set[tuple[int, int]] = set()
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        return iter(self.cells)
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __contains__(self, cell: tuple[int, int]) -> bool:
+        return cell in self.cells
+
+    def add(self, cell: tuple[int, int]):
+        if cell not in self.cells:
+            self.cells.add(cell)
+            self.changed.add(cell)
+
+    def remove(self, cell: tuple[int, int]):
+        self.cells.remove(cell)
+        self.changed.discard(cell)
+
+    def touch(self, cell: tuple[int, int]):
+        # the cell has been stepped on or flagged, so any pair with it as a neighbour needs checking again
+        for neighbour in self.agent.game.neighbours(cell):
+            if neighbour in self.cells:
+                self.changed.add(neighbour)
+
+    def pop_dirty(self) -> list[tuple[tuple[int, int], tuple[int, int]]]:
+        pairs = set()
+        for cell in self.changed:
+            # only cells within a 5x5 window can share a neighbour, and while there are fewer cells
+            # than in that window it's quicker to look through all of them instead
+            if len(self.cells) <= 25:
+                window = (other for other in self.cells if abs(other[0] - cell[0]) <= 2 and abs(other[1] - cell[1]) <= 2)
+            else:
+                window = ((cell[0] + row, cell[1] + col) for row, col in iter_square(range(-2, 3)))
+            for other in window:
+                if other != cell and other in self.cells and self.agent.overlapping(cell, other):
+                    pairs.add(pair(cell, other))
+        self.changed.clear()
+        return list(pairs)
+
+
+def pair(a: tuple[int, int], b: tuple[int, int]) -> tuple[tuple[int, int], tuple[int, int]]:
+    return (a, b) if a < b else (b, a)
 
 
 class SetAgent(SimpleAgent):
+    # what the collector calls the deductions made once primitive runs dry
+    frontier_phase = "pairwise"
 
-    def __init__(self, game: Minesweeper, seed=None):
-        super().__init__(game, seed=seed)
+    def __init__(self, game: Minesweeper, seed=None, probability: ProbabilityEngine = None, patterns: PatternCache = None):
+        super().__init__(game, seed=seed, patterns=patterns)
+        self.probability = probability
 
     def pairwise(self, a: tuple[int, int], b: tuple[int, int]) -> tuple[set[tuple[int, int]], set[tuple[int, int]]]:
         to_step = set()
@@ -34,93 +96,174 @@ class SetAgent(SimpleAgent):
             to_step |= pos_cells_no_flags
         return to_step, to_flag
 
+    def cached_pairwise(self, a: tuple[int, int], b: tuple[int, int]) -> tuple[set[tuple[int, int]], set[tuple[int, int]]]:
+        key = pair_key(self.game, a, b)
+        entry = self.patterns.get(key)
+        if entry is None:
+            to_step, to_flag = self.pairwise(a, b)
+            self.patterns.put(key, (to_offsets(to_step, a), to_offsets(to_flag, a)))
+            return to_step, to_flag
+        return from_offsets(entry[0], a), from_offsets(entry[1], a)
+
+    def frontier_round(self, to_pair_search: PairIndex, to_step: set[tuple[int, int]], to_flag: set[tuple[int, int]],
+                       to_search: set[tuple[int, int]]) -> tuple[int, int]:
+        # runs once primitive has nothing left, adding what it finds to to_step and to_flag
+        # and returning how many pairs it checked and how many deductions they made
+        pairwise = self.pairwise if self.patterns is None else self.cached_pairwise
+        iterations = 0
+        deductions = 0
+        # pairs which haven't seen a change since they were last checked can't have anything new to say
+        for a, b in to_pair_search.pop_dirty():
+            new_steps, new_flags = pairwise(a, b)
+            iterations += 1
+            deductions += len(new_steps) + len(new_flags)
+            to_step |= new_steps
+            to_flag |= new_flags
+            if len(new_flags | new_steps) > 0:
+                for neighbour in (self.game.neighbours(a) | self.game.neighbours(b)) & self.game.stepped:
+                    to_search.add(neighbour)
+                try:
+                    to_pair_search.remove(a)
+                except KeyError:
+                    pass
+                try:
+                    to_pair_search.remove(b)
+                except KeyError:
+                    pass
+        return iterations, deductions
+
+    def overlapping(self, a: tuple[int, int], b: tuple[int, int]) -> bool:
+        return not self.game.neighbours(a).isdisjoint(self.game.neighbours(b))
+
+    def unresolved(self, c: tuple[int, int], *pending: set[tuple[int, int]]) -> bool:
+        # whether c still has a neighbour we know nothing about, including what's queued up to be done
+        if c not in self.game.border:
+            return False
+        for neighbour in self.game.neighbours(c):
+            if neighbour not in self.game.stepped and neighbour not in self.game.flagged and not any(neighbour in p for p in pending):
+                return True
+        return False
+
+    def guess(self, to_pair_search: PairIndex) -> tuple[int, int]:
+        if self.probability is not None:
+            result = self.probability.probabilities(self.game)
+            if result is not None:
+                return self.safest(*result)
+        # we can try to make our random choices smarter
+        # by prioritizing random choices with less probability of failure
+        prob_fail = self.game.mines_remaining() / self.game.tiles_remaining()
+        # anywhere on the board, unless we find somewhere better
+        field = None
+        # we use what's in the to-pair-wise search list, as we know they're all adjacent to untouched cells
+        for cell in to_pair_search:
+            this_field = self.game.neighbours(cell) & self.game.frontier
+            this_prob_fail = (self.game.cell_value(cell) - len(self.game.neighbours(cell) & self.game.flagged)) / len(this_field)
+            if this_prob_fail <= prob_fail:
+                prob_fail = this_prob_fail
+                field = this_field
+        if field is None:
+            return self.game.random_unknown(self.random)
+        return self.random.choice(list(field))
+
+    def safest(self, probabilities: dict[tuple[int, int], float], other_probability: float) -> tuple[int, int]:
+        # a random choice between the cells least likely to be a mine, preferring the frontier when it's a tie
+        best = min(probabilities.values(), default=None)
+        if self.game.tiles_remaining() > len(probabilities) and (best is None or other_probability < best):
+            return self.game.random_unknown(self.random, exclude=probabilities.keys())
+        return self.random.choice([cell for cell, probability in probabilities.items() if probability <= best + 1e-9])
+
     def play(self, **kwargs):
         show_mines = kwargs['show_mines'] if "show_mines" in kwargs.keys() else False
         coloured = kwargs['coloured'] if 'coloured' in kwargs.keys() else False
         verbosity = kwargs['verbosity'] if 'verbosity' in kwargs.keys() else 0
         show_strategy = kwargs['show_strategy'] if 'show_strategy' in kwargs.keys() else False
         step_by_step = kwargs['step_by_step'] if 'step_by_step' in kwargs.keys() else False
-        mf = kwargs['manim_file'] if 'manim_file' in kwargs.keys() else None
-        cell_path = kwargs['cell_graphic_path'] if 'cell_graphic_path' in kwargs.keys() else None
-        flagged_path = kwargs['flagged_graphic_path'] if 'flagged_graphic_path' in kwargs.keys() else None
-        mine_path = kwargs['mine_graphic_path'] if 'mine_graphic_path' in kwargs.keys() else None
-        if mf:
-            agent_prelim(mf, self.game, cell_path=cell_path, flagged_path=flagged_path, mine_path=mine_path)
+        collector: PhaseCollector = kwargs['collector'] if 'collector' in kwargs.keys() else None
+        if collector:
+            collector.start_game()
+        primitive = self.primitive if self.patterns is None else self.cached_primitive
         # the tiles we know we need to step onto next
         to_step = {(self.random.randrange(self.game.row_count), self.random.randrange(self.game.col_count))}
+        # the first step is as much a guess as any other
+        self.moves = 0
+        self.guesses = 1
         # the tiles we know to flag next
         to_flag = set()
         # the tiles we have already stepped onto and need to search
         to_search = set()
         # the tiles to use for pairwise search
-        to_pair_search = set()
+        to_pair_search = PairIndex(self)
         running = True
         state_changed = False
-        while len(self.game.grid - self.game.flagged - self.game.stepped) > 0 and running:
+        while self.game.tiles_remaining() > 0 and running:
+            if self.game.recorder:
+                self.game.recorder.round()
             if len(to_step) + len(to_flag) + len(to_search) == 0 and not state_changed:
-                # we can try to make our random choices smarter
-                # by prioritizing random choices with less probability of failure
-                prob_fail = self.game.mines_remaining() / self.game.tiles_remaining()
-                field = self.game.grid - self.game.flagged - self.game.stepped
-                # we use what's in the to-pair-wise search list, as we know they're all adjacent to untouched cells
-                for cell in to_pair_search:
-                    this_field = self.game.neighbours(cell) - self.game.flagged - self.game.stepped
-                    this_prob_fail = (self.game.cell_value(cell) - len(self.game.neighbours(cell) & self.game.flagged)) / len(this_field)
-                    if this_prob_fail <= prob_fail:
-                        prob_fail = this_prob_fail
-                        field = this_field
-                tile = self.random.choice(list(field))
+                if collector:
+                    started = perf_counter()
+                tile = self.guess(to_pair_search)
+                self.guesses += 1
                 if self.game.mines_remaining() == self.game.tiles_remaining():
                     to_flag.add(tile)
                 else:
                     to_step.add(tile)
+                if collector:
+                    collector.record("guess", perf_counter() - started, frontier=len(to_pair_search))
             state_changed = False
-            if mf:
-                tf = to_flag.copy()
+            if collector:
+                started = perf_counter()
+                iterations = len(to_flag)
             # flag a tile we know we should flag
             while len(to_flag) > 0:
                 tile = to_flag.pop()
                 self.game.flag(tile)
+                self.moves += 1
+                to_pair_search.touch(tile)
                 for neighbour in self.game.neighbours(tile) & self.game.stepped:
                     to_search.add(neighbour)
                 state_changed = True
-            if mf:
-                if len(tf) > 0:
-                    mf.write(f"""    to_flag = {list(tf)}
-    fg = AnimationGroup(*(Transform(cells[c[0] * cols + c[1]], flags[c[0] * cols + c[1]]) for c in to_flag))
-    self.play(fg)
-""")
-            if mf:
-                ts = to_step.copy()
+            if collector and iterations:
+                collector.record("flag", perf_counter() - started, iterations=iterations, frontier=len(to_pair_search))
+            if collector:
+                started = perf_counter()
+                iterations = len(to_step)
             # step onto a tile we know we should step onto
             while len(to_step) > 0:
                 tile = to_step.pop()
+                self.moves += 1
                 try:
-                    self.game.step(tile, mf)
+                    revealed = self.game.step_region(tile)
                 except ValueError:
                     running = False
-                to_search.add(tile)
-                for neighbour in self.game.neighbours(tile) & self.game.stepped:
-                    to_search.add(neighbour)
+                    revealed = {tile: None}
+                else:
+                    to_step -= revealed.keys()
+                    to_search |= self.searchable(revealed)
+                for cell in revealed:
+                    to_pair_search.touch(cell)
                 state_changed = True
-            if mf:
-                if len(ts) > 0:
-                    mf.write(f"""    to_step = {list(ts)}
-    sg = AnimationGroup(*(cells[c[0] * cols + c[1]].animate.set_fill(opacity=0.0) for c in to_step))
-    self.play(sg)
-""")
+            if collector and iterations:
+                collector.record("step", perf_counter() - started, iterations=iterations, frontier=len(to_pair_search))
             if verbosity > 2:
                 self.game.draw(show_mines=show_mines, coloured=coloured, highlighted=list(to_pair_search) if show_strategy else None, underlined=list(to_search) if show_strategy else None)
                 if step_by_step:
                     input()
+            if collector:
+                started = perf_counter()
+                frontier = len(to_pair_search)
+                iterations = 0
+                deductions = 0
             # search a tile we know we should search
             if len(to_search) > 0:
                 while len(to_search) > 0:
                     tile = to_search.pop()
-                    new_steps, new_flags = self.primitive(tile)
+                    new_steps, new_flags = primitive(tile)
+                    if collector:
+                        iterations += 1
+                        deductions += len(new_steps) + len(new_flags)
                     to_step |= new_steps
                     to_flag |= new_flags
-                    if len(self.game.neighbours(tile) - (self.game.stepped | self.game.flagged | to_step | to_flag)) != 0:
+                    if self.unresolved(tile, to_step, to_flag):
                         to_pair_search.add(tile)
                         state_changed = True
                     else:
@@ -128,24 +271,18 @@ class SetAgent(SimpleAgent):
                             to_pair_search.remove(tile)
                         except KeyError:
                             pass
+                if collector:
+                    collector.record("primitive", perf_counter() - started, iterations=iterations, frontier=frontier,
+                                     deductions=deductions)
             else:
-                for a, b in combinations(to_pair_search, 2):
-                    if len(self.game.neighbours(a) & self.game.neighbours(b)) != 0:
-                        new_steps, new_flags = self.pairwise(a, b)
-                        to_step |= new_steps
-                        to_flag |= new_flags
-                        if len(new_flags | new_steps) > 0:
-                            for neighbour in (self.game.neighbours(a) | self.game.neighbours(b)) & self.game.stepped:
-                                to_search.add(neighbour)
-                            try:
-                                to_pair_search.remove(a)
-                            except KeyError:
-                                pass
-                            try:
-                                to_pair_search.remove(b)
-                            except KeyError:
-                                pass
-                            state_changed = True
+                iterations, deductions = self.frontier_round(to_pair_search, to_step, to_flag, to_search)
+                if deductions:
+                    state_changed = True
+                if collector:
+                    collector.record(self.frontier_phase, perf_counter() - started, iterations=iterations,
+                                     frontier=frontier, deductions=deductions)
+        if collector:
+            collector.end_game(won=self.game.winning_state())
         if verbosity > 1:
             self.game.draw(show_mines=show_mines, coloured=coloured)
         if verbosity > 0:
@@ -153,5 +290,3 @@ class SetAgent(SimpleAgent):
                 print("I Won!")
             else:
                 print("I lost...")
-        if mf:
-            agent_term(mf)
@@ -1,16 +1,26 @@
 from game import Minesweeper
 from random import Random
+from time import perf_counter
+from profiling import PhaseCollector
+from patterncache import PatternCache, primitive_key, to_offsets, from_offsets
 
 
 class SimpleAgent:
 
-    def __init__(self, game: Minesweeper, seed=None):
+    def __init__(self, game: Minesweeper, seed=None, patterns: PatternCache = None):
         self.game = game
         self.random = Random(seed)
+        self.patterns = patterns
+        # how many steps and flags were made in the last game played, and how many of those were guesses
+        self.moves = 0
+        self.guesses = 0
 
     def primitive(self, c: tuple[int, int]) -> tuple[set[tuple[int, int]], set[tuple[int, int]]]:
         to_step = set()
         to_flag = set()
+        if c not in self.game.border:
+            # every neighbour is already stepped on or flagged
+            return to_step, to_flag
         not_stepped_neighbours = self.game.neighbours(c) - self.game.stepped
         if len(not_stepped_neighbours) == self.game.cell_value(c):
             to_flag = not_stepped_neighbours - self.game.flagged
@@ -18,46 +28,96 @@ class SimpleAgent:
             to_step = not_stepped_neighbours - self.game.flagged
         return to_step, to_flag
 
+    def cached_primitive(self, c: tuple[int, int]) -> tuple[set[tuple[int, int]], set[tuple[int, int]]]:
+        if c not in self.game.border:
+            return self.primitive(c)
+        key = primitive_key(self.game, c)
+        entry = self.patterns.get(key)
+        if entry is None:
+            to_step, to_flag = self.primitive(c)
+            self.patterns.put(key, (to_offsets(to_step, c), to_offsets(to_flag, c)))
+            return to_step, to_flag
+        return from_offsets(entry[0], c), from_offsets(entry[1], c)
+
+    def searchable(self, revealed: dict[tuple[int, int], int]) -> set[tuple[int, int]]:
+        # the stepped cells with something new to say after some cells were revealed, leaving out zeros
+        # as the game has already stepped around them
+        to_search = set()
+        for cell in revealed:
+            to_search.add(cell)
+            to_search |= self.game.neighbours(cell) & self.game.stepped
+        return {cell for cell in to_search if self.game.cell_value(cell)}
+
     def play(self, **kwargs):
         show_mines = kwargs['show_mines'] if "show_mines" in kwargs.keys() else False
         coloured = kwargs['coloured'] if 'coloured' in kwargs.keys() else False
         verbosity = kwargs['verbosity'] if 'verbosity' in kwargs.keys() else 0
+        collector: PhaseCollector = kwargs['collector'] if 'collector' in kwargs.keys() else None
+        if collector:
+            collector.start_game()
+        primitive = self.primitive if self.patterns is None else self.cached_primitive
         # the tiles we know we need to step onto next
         to_step = {(self.random.randrange(self.game.row_count), self.random.randrange(self.game.col_count))}
+        # the first step is as much a guess as any other
+        self.moves = 0
+        self.guesses = 1
         # the tiles we know to flag next
         to_flag = set()
         # the tiles we have already stepped onto but have yet to use the information of
         to_search = set()
-        while self.game.flagged | self.game.stepped != self.game.grid:
+        while self.game.tiles_remaining() > 0:
+            if self.game.recorder:
+                self.game.recorder.round()
             # flag a tile we know we should flag
             if len(to_flag) > 0:
+                if collector:
+                    started = perf_counter()
                 tile = to_flag.pop()
                 self.game.flag(tile)
+                self.moves += 1
                 for neighbour in self.game.neighbours(tile) & self.game.stepped:
                     to_search.add(neighbour)
+                if collector:
+                    collector.record("flag", perf_counter() - started, frontier=len(to_search))
             # step onto a tile we know we should step onto
             if len(to_step) > 0:
+                if collector:
+                    started = perf_counter()
                 tile = to_step.pop()
+                self.moves += 1
                 try:
-                    self.game.step(tile)
+                    revealed = self.game.step_region(tile)
                 except ValueError:
                     break
-                to_search.add(tile)
-                for neighbour in self.game.neighbours(tile) & self.game.stepped:
-                    to_search.add(neighbour)
+                to_step -= revealed.keys()
+                to_search |= self.searchable(revealed)
+                if collector:
+                    collector.record("step", perf_counter() - started, frontier=len(to_search))
             # search a tile we know we should search
             if len(to_search) > 0:
+                if collector:
+                    started = perf_counter()
                 tile = to_search.pop()
-                new_steps, new_flags = self.primitive(tile)
+                new_steps, new_flags = primitive(tile)
                 to_step |= new_steps
                 to_flag |= new_flags
+                if collector:
+                    collector.record("primitive", perf_counter() - started, frontier=len(to_search),
+                                     deductions=len(new_steps) + len(new_flags))
             if len(to_step) + len(to_flag) + len(to_search) == 0:
+                if collector:
+                    started = perf_counter()
                 try:
-                    tile = self.random.choice(list(self.game.grid - self.game.flagged - self.game.stepped))
+                    tile = self.game.random_unknown(self.random)
                     to_step.add(tile)
+                    self.guesses += 1
                 except IndexError:
                     break
+                if collector:
+                    collector.record("guess", perf_counter() - started)
             if verbosity > 2:
                 self.game.draw(show_mines=show_mines, coloured=coloured)
+        if collector:
+            collector.end_game(won=self.game.winning_state())
         if verbosity > 1:
             self.game.draw(show_mines=show_mines, coloured=coloured)
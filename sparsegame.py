@@ -0,0 +1,196 @@
+from typing import Iterable
+from random import Random
+import numpy as np
+from game import Minesweeper, iter_square
+from vectorgame import neighbour_sum
+
+
+HYPERGEOMETRIC_LIMIT = 10 ** 9
+OFFSETS = tuple((row, col) for row, col in iter_square(range(-1, 2)) if row or col)
+
+
+class SparseMines:
+    """
+    The mines of a board too big to lay out in full, generated a chunk at a time as they're looked at.
+    The board's mine count is shared out between halves of the board, then halves of those and so on down to
+    single chunks, each split drawn from a generator seeded by the board seed and the region being split.
+    This gives exactly the right number of mines overall while any one chunk can be generated on its own.
+    """
+
+    def __init__(self, rows: int, columns: int, mines: int, seed: int, chunk_size: int = 64):
+        self.row_count = rows
+        self.col_count = columns
+        self.mine_count = mines
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.chunk_rows = -(-rows // chunk_size)
+        self.chunk_cols = -(-columns // chunk_size)
+        self.chunks: dict[tuple[int, int], set[tuple[int, int]]] = {}
+        # mines moved by first-safe, on top of what the chunks generate
+        self.removed: set[tuple[int, int]] = set()
+        self.added: set[tuple[int, int]] = set()
+
+    def __contains__(self, cell: tuple[int, int]) -> bool:
+        if cell in self.added:
+            return True
+        if cell in self.removed:
+            return False
+        chunk = (cell[0] // self.chunk_size, cell[1] // self.chunk_size)
+        if chunk not in self.chunks:
+            self.chunks[chunk] = self.generate(chunk)
+        return cell in self.chunks[chunk]
+
+    def within(self, top: int, bottom: int, left: int, right: int) -> Iterable[tuple[int, int]]:
+        # every mine in a range of rows and columns, generating the chunks it covers
+        for chunk_row in range(top // self.chunk_size, -(-bottom // self.chunk_size)):
+            for chunk_col in range(left // self.chunk_size, -(-right // self.chunk_size)):
+                chunk = (chunk_row, chunk_col)
+                if chunk not in self.chunks:
+                    self.chunks[chunk] = self.generate(chunk)
+                for cell in self.chunks[chunk] - self.removed:
+                    if top <= cell[0] < bottom and left <= cell[1] < right:
+                        yield cell
+        for cell in self.added:
+            if top <= cell[0] < bottom and left <= cell[1] < right:
+                yield cell
+
+    def area(self, row_start: int, row_end: int, col_start: int, col_end: int) -> int:
+        # the number of cells in a range of chunks, as chunks along the bottom and right edges may be cut short
+        rows = min(row_end * self.chunk_size, self.row_count) - row_start * self.chunk_size
+        cols = min(col_end * self.chunk_size, self.col_count) - col_start * self.chunk_size
+        return rows * cols
+
+    @staticmethod
+    def share(rng: np.random.Generator, first_area: int, second_area: int, mines: int) -> int:
+        # the number of mines falling in the first of two areas
+        if not mines:
+            return 0
+        if first_area < HYPERGEOMETRIC_LIMIT and second_area < HYPERGEOMETRIC_LIMIT:
+            return int(rng.hypergeometric(first_area, second_area, mines))
+        # NumPy can't draw from populations this big, but drawing with replacement is as good as without at this size
+        first_mines = int(rng.binomial(mines, first_area / (first_area + second_area)))
+        return min(max(first_mines, mines - second_area), first_area)
+
+    def generate(self, chunk: tuple[int, int]) -> set[tuple[int, int]]:
+        row_start, row_end, col_start, col_end = 0, self.chunk_rows, 0, self.chunk_cols
+        mines = self.mine_count
+        while row_end - row_start > 1 or col_end - col_start > 1:
+            rng = np.random.default_rng([self.seed, row_start, row_end, col_start, col_end])
+            # split the longer side in two, and share the mines between the halves
+            if row_end - row_start >= col_end - col_start:
+                middle = (row_start + row_end) // 2
+                first = (row_start, middle, col_start, col_end)
+                second = (middle, row_end, col_start, col_end)
+                in_first = chunk[0] < middle
+            else:
+                middle = (col_start + col_end) // 2
+                first = (row_start, row_end, col_start, middle)
+                second = (row_start, row_end, middle, col_end)
+                in_first = chunk[1] < middle
+            first_mines = self.share(rng, self.area(*first), self.area(*second), mines)
+            row_start, row_end, col_start, col_end = first if in_first else second
+            mines = first_mines if in_first else mines - first_mines
+        rng = np.random.default_rng([self.seed, row_start, row_end, col_start, col_end])
+        cols = min(col_end * self.chunk_size, self.col_count) - col_start * self.chunk_size
+        positions = rng.choice(self.area(row_start, row_end, col_start, col_end), size=mines, replace=False)
+        return {(row_start * self.chunk_size + int(p) // cols, col_start * self.chunk_size + int(p) % cols) for p in positions}
+
+
+class NeighbourCounts(dict):
+    # unknown neighbour counts, only stored for cells next to something known
+    def __init__(self, game: Minesweeper):
+        super().__init__()
+        self.game = game
+
+    def __missing__(self, cell: tuple[int, int]) -> int:
+        return len(self.game.neighbours(cell))
+
+
+class SparseMinesweeper(Minesweeper):
+    """
+    Minesweeper for boards too big to hold in memory, only storing the cells stepped on or flagged
+    and generating mines as they're needed, so memory grows with the explored region rather than the board.
+    There's no grid of every cell, so agents pick random cells through random_unknown.
+    """
+
+    def __init__(self, rows: int, columns: int, mines: int, seed=None, first_safe=False, chunk_size: int = 64):
+        self.chunk_size = chunk_size
+        super().__init__(rows, columns, mines, seed=seed, first_safe=first_safe)
+
+    def reset(self, mines: Iterable[tuple[int, int]] = None):
+        if mines is not None:
+            raise ValueError("A sparse game generates its own mines as they're needed, so it can't be given a layout")
+        self.stepped = set()
+        self.flagged = set()
+        self._mines = SparseMines(self.row_count, self.col_count, self.mine_count, self.random.getrandbits(64), self.chunk_size)
+        self._ignore_mine = self.first_safe
+        self.border = set()
+        self.frontier = set()
+        self._unknown_count = self.row_count * self.col_count
+        self._flagged_mines = 0
+        self._exploded = False
+        self._values = {}
+        self._unknown_neighbours = NeighbourCounts(self)
+        self.renderer.invalidate()
+
+    def neighbours(self, cell: tuple[int, int]) -> set[tuple[int, int]]:
+        row, col = cell
+        return {
+            (row + r, col + c) for r, c in OFFSETS if 0 <= row + r < self.row_count and 0 <= col + c < self.col_count
+        }
+
+    def cell_value(self, cell: tuple[int, int]) -> int:
+        if cell not in self.stepped:
+            raise ValueError("That's cheating!")
+        # cached once stepped, as first-safe only moves a mine before the first value is worked out
+        if cell not in self._values:
+            self._values[cell] = sum(neighbour in self._mines for neighbour in self.neighbours(cell))
+        return self._values[cell]
+
+    def step(self, cell: tuple[int, int]) -> int:
+        unknown = cell not in self.stepped and cell not in self.flagged
+        self.stepped.add(cell)
+        self._known(cell, unknown)
+        if cell in self._mines:
+            if self._ignore_mine:
+                new_mine = cell
+                while new_mine in self.stepped or new_mine in self._mines:
+                    new_mine = (self.random.randrange(self.row_count), self.random.randrange(self.col_count))
+                self._mines.added.discard(cell)
+                self._mines.removed.add(cell)
+                self._mines.removed.discard(new_mine)
+                self._mines.added.add(new_mine)
+                self._flagged_mines += (new_mine in self.flagged) - (cell in self.flagged)
+            else:
+                self._exploded = True
+                raise ValueError("Boom!")
+        self._ignore_mine = False
+        return self.cell_value(cell)
+
+    def random_unknown(self, random: Random, exclude: Iterable[tuple[int, int]] = ()) -> tuple[int, int]:
+        exclude = set(exclude)
+        if self.tiles_remaining() <= len(exclude):
+            raise IndexError("No unknown cells left")
+        while True:
+            cell = (random.randrange(self.row_count), random.randrange(self.col_count))
+            if cell not in self.stepped and cell not in self.flagged and cell not in exclude:
+                return cell
+
+    def get_board(self, top: int = 0, left: int = 0, rows: int = None, columns: int = None) -> np.ndarray:
+        """
+        The board as from Minesweeper.get_board, for the given number of rows and columns from top, left,
+        and the rest of the board if not given. Only ask for as much as fits in memory, as the mines in and
+        around the window are generated to count it.
+        """
+        rows = self.row_count - top if rows is None else rows
+        columns = self.col_count - left if columns is None else columns
+        if not (0 <= top and 0 <= left and 0 <= rows and 0 <= columns
+                and top + rows <= self.row_count and left + columns <= self.col_count):
+            raise ValueError("The window goes off the board")
+        # a cell either side, so cells on the edge of the window count the mines just outside it
+        mines = np.zeros((rows + 2, columns + 2), dtype=np.int8)
+        for row, col in self._mines.within(max(top - 1, 0), top + rows + 1, max(left - 1, 0), left + columns + 1):
+            mines[row - top + 1, col - left + 1] = 1
+        board = neighbour_sum(mines)
+        board[mines == 1] = 9
+        return board[1:-1, 1:-1]
@@ -0,0 +1,37 @@
+from math import comb, erfc, sqrt
+from statistics import NormalDist
+
+
+def z_score(confidence: float) -> float:
+    # the number of standard deviations either side of the mean covering the given share of a normal distribution
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def wilson(wins: int, games: int, confidence: float = 0.95) -> tuple[float, float]:
+    """
+    The Wilson score interval for a win rate, which unlike the usual normal interval stays inside 0 and 1
+    and keeps its coverage for win rates near either end.
+    """
+    if games == 0:
+        return 0.0, 1.0
+    z = z_score(confidence)
+    rate = wins / games
+    denominator = 1 + z * z / games
+    centre = (rate + z * z / (2 * games)) / denominator
+    half_width = z * sqrt(rate * (1 - rate) / games + z * z / (4 * games * games)) / denominator
+    return max(0.0, centre - half_width), min(1.0, centre + half_width)
+
+
+def mcnemar(only_a: int, only_b: int) -> float:
+    """
+    The two-sided p-value of McNemar's test, that neither agent wins boards the other loses more often.
+    Exact from the binomial distribution for small counts, and the continuity corrected chi-squared test otherwise.
+    """
+    discordant = only_a + only_b
+    if discordant == 0:
+        return 1.0
+    if discordant <= 100:
+        tail = sum(comb(discordant, k) for k in range(min(only_a, only_b) + 1)) / 2 ** discordant
+        return min(1.0, 2 * tail)
+    chi2 = (abs(only_a - only_b) - 1) ** 2 / discordant
+    return erfc(sqrt(chi2 / 2))
@@ -0,0 +1,157 @@
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from vectorgame import MinesweeperBatch
+from vectoragent import VectorSimpleAgent, primitive, pairwise
+
+# how far past the edge of its tile each worker looks, the furthest a pairwise deduction can depend on:
+# a cell found by a pair of stepped on cells two apart, through the neighbours of the further one
+HALO = 4
+RULES = {"primitive": primitive, "pairwise": pairwise}
+SHARED = ("stepped", "flagged", "counts")
+
+# the board state as seen by this process, either the game's own arrays or views of the shared memory holding them
+_shared: dict[str, np.ndarray] = None
+_memory: list[SharedMemory] = None
+
+
+def attach(names: dict[str, str], shape: tuple[int, ...], dtypes: dict[str, str]):
+    global _shared, _memory
+    _memory = [SharedMemory(name) for name in names.values()]
+    _shared = {key: np.ndarray(shape, dtype=dtypes[key], buffer=memory.buf) for key, memory in zip(names, _memory)}
+
+
+def solve_tile(task: tuple[int, tuple[int, int, int, int], tuple[str, ...]]) -> tuple[int, np.ndarray, np.ndarray]:
+    """
+    Deduces everything the rules can inside one tile, following its own deductions through until it runs out.
+    Returns the tile's index with the positions on the whole board of the cells to step on and to flag.
+    """
+    index, (top, bottom, left, right), rules = task
+    rows, cols = _shared["stepped"].shape[-2:]
+    window = slice(max(top - HALO, 0), min(bottom + HALO, rows)), slice(max(left - HALO, 0), min(right + HALO, cols))
+    # copied, as other tiles' deductions only count once the coordinator has made them
+    stepped = _shared["stepped"][0][window].copy()
+    flagged = _shared["flagged"][0][window].copy()
+    # counts never change after the first move, and are only read where a cell has been stepped on
+    counts = _shared["counts"][0][window]
+    # only the tile itself is decided here, the halo gives the cells near its edge their full surroundings
+    # so everything found inside is what the rules would find looking at the whole board
+    inside = np.zeros_like(stepped)
+    inside[top - window[0].start:bottom - window[0].start, left - window[1].start:right - window[1].start] = True
+    to_step = np.zeros_like(stepped)
+    to_flag = np.zeros_like(stepped)
+    while True:
+        values = np.where(stepped, counts, 0)
+        for rule in rules:
+            step, flag = RULES[rule](stepped, flagged, values)
+            step &= inside
+            flag &= inside
+            if step.any() or flag.any():
+                break
+        else:
+            break
+        # deductions are certain, so stepping on them here reveals the same values the game will
+        to_step |= step
+        to_flag |= flag
+        stepped |= step
+        flagged |= flag
+    origin = np.array([[window[0].start], [window[1].start]])
+    step_rows, step_cols = np.nonzero(to_step) + origin
+    flag_rows, flag_cols = np.nonzero(to_flag) + origin
+    return index, np.ravel_multi_index((step_rows, step_cols), (rows, cols)), \
+        np.ravel_multi_index((flag_rows, flag_cols), (rows, cols))
+
+
+class TileSimpleAgent(VectorSimpleAgent):
+    """
+    Plays a single large board split into square tiles, deducing each tile in parallel across worker processes
+    with the rule of SimpleAgent.primitive, while the agent itself makes the moves and guesses as VectorSimpleAgent.
+    The stepped, flagged and count arrays are moved into shared memory so workers read the board without copying it.
+    Tiles don't overlap, so the deductions of each are simply combined. Only tiles with something new in or around
+    them since they last ran are deduced again, as each already follows its own deductions through.
+    """
+    rules = ("primitive",)
+
+    def __init__(self, batch: MinesweeperBatch, seed=None, tile_size: int = 256, workers: int = None):
+        super().__init__(batch, seed)
+        if batch.board_count != 1:
+            raise ValueError("Tiled agents play a single board")
+        self.workers = workers
+        rows, cols = batch.row_count, batch.col_count
+        self.tiles = [
+            (top, min(top + tile_size, rows), left, min(left + tile_size, cols))
+            for top in range(0, rows, tile_size) for left in range(0, cols, tile_size)
+        ]
+        self.windows = [
+            (slice(max(top - HALO, 0), bottom + HALO), slice(max(left - HALO, 0), right + HALO))
+            for top, bottom, left, right in self.tiles
+        ]
+        # the tiles deduced over the game, against how many would have been without skipping unchanged ones
+        self.tiles_solved = 0
+        self.tiles_offered = 0
+        self.pool: Pool = None
+        self._memory: list[SharedMemory] = []
+        self._known: np.ndarray = None
+        self._deduced: list[int] = [0] * len(self.tiles)
+
+    def deduce(self, boards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        known = self.batch.stepped[0] | self.batch.flagged[0]
+        changed = known if self._known is None else known & ~self._known
+        self._known = known
+        # a tile's own deductions always change its window, so it's only worth another look if something else has
+        tasks = [
+            (i, tile, self.rules) for i, (tile, window) in enumerate(zip(self.tiles, self.windows))
+            if np.count_nonzero(changed[window]) > self._deduced[i]
+        ]
+        self.tiles_offered += len(self.tiles)
+        self.tiles_solved += len(tasks)
+        self._deduced = [0] * len(self.tiles)
+        to_step = np.zeros(known.size, dtype=bool)
+        to_flag = np.zeros(known.size, dtype=bool)
+        results = map(solve_tile, tasks) if self.pool is None else self.pool.imap_unordered(solve_tile, tasks)
+        for i, step, flag in results:
+            to_step[step] = True
+            to_flag[flag] = True
+            self._deduced[i] = len(step) + len(flag)
+        return to_step.reshape((1,) + known.shape), to_flag.reshape((1,) + known.shape)
+
+    def play(self, **kwargs) -> np.ndarray:
+        global _shared
+        if self.workers == 1:
+            _shared = {key: getattr(self.batch, key) for key in SHARED}
+            return super().play(**kwargs)
+        self.share()
+        try:
+            names = {key: memory.name for key, memory in zip(SHARED, self._memory)}
+            dtypes = {key: getattr(self.batch, key).dtype.str for key in SHARED}
+            with Pool(self.workers, initializer=attach, initargs=(names, self.batch.stepped.shape, dtypes)) as self.pool:
+                return super().play(**kwargs)
+        finally:
+            self.pool = None
+            self.release()
+
+    def share(self):
+        # the game keeps playing on views of the shared memory, so every move it makes is seen by the workers
+        for key in SHARED:
+            array = getattr(self.batch, key)
+            memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+            view[:] = array
+            setattr(self.batch, key, view)
+            self._memory.append(memory)
+
+    def release(self):
+        # copied back out so the finished game can still be looked at once the shared memory is gone
+        for key in SHARED:
+            setattr(self.batch, key, getattr(self.batch, key).copy())
+        for memory in self._memory:
+            memory.close()
+            memory.unlink()
+        self._memory = []
+
+
+class TileSetAgent(TileSimpleAgent):
+    """
+    Extends TileSimpleAgent with the rule of SetAgent.pairwise, used on tiles where primitive finds nothing.
+    """
+    rules = ("primitive", "pairwise")
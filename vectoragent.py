@@ -0,0 +1,112 @@
+import numpy as np
+from itertools import product as iter_prod
+from vectorgame import MinesweeperBatch, OFFSETS, shifted, offset_sum, neighbour_sum
+
+
+# every offset to a second cell whose neighbourhood could overlap with the first's
+PAIR_OFFSETS = tuple((row, col) for row, col in iter_prod(range(-2, 3), range(-2, 3)) if row or col)
+
+
+class VectorSimpleAgent:
+    """
+    Plays every game of a MinesweeperBatch at once using the rule of SimpleAgent.primitive,
+    applied to every stepped on cell of every board still being played in each round.
+    Rules take the indices of the boards to look at and return step and flag masks for just those boards.
+    """
+
+    def __init__(self, batch: MinesweeperBatch, seed=None):
+        self.batch = batch
+        self.random = np.random.default_rng(seed)
+
+    def primitive(self, boards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return primitive(self.batch.stepped[boards], self.batch.flagged[boards], self.batch.values(boards))
+
+    def deduce(self, boards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return self.primitive(boards)
+
+    def guess(self, boards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # a uniformly random unknown cell on each of the given boards
+        unknown = self.batch.unknown(boards)
+        scores = np.where(unknown, self.random.random(unknown.shape), -1).reshape((len(boards), -1))
+        choice = np.zeros(scores.shape, dtype=bool)
+        np.put_along_axis(choice, scores.argmax(axis=1)[:, None], True, axis=1)
+        choice = choice.reshape(unknown.shape)
+        certain = (self.batch.mines_remaining(boards) == self.batch.tiles_remaining(boards))[:, None, None]
+        return choice & ~certain, choice & certain
+
+    def play(self, **kwargs) -> np.ndarray:
+        """
+        Plays every board in the batch to completion, returning how many rounds each board took.
+        """
+        max_rounds = kwargs['max_rounds'] if 'max_rounds' in kwargs.keys() else None
+        rounds = np.zeros(self.batch.board_count, dtype=np.int64)
+        # the first move on each board is a random cell, as with the other agents
+        boards = np.arange(self.batch.board_count)
+        to_step, to_flag = self.guess(boards)
+        while True:
+            self.batch.flag(to_flag, boards)
+            self.batch.step(to_step, boards)
+            boards = np.flatnonzero(~self.batch.finished())
+            if len(boards) == 0 or (max_rounds is not None and rounds.max() >= max_rounds):
+                break
+            rounds[boards] += 1
+            to_step, to_flag = self.deduce(boards)
+            stuck = ~(to_step | to_flag).any(axis=(1, 2))
+            if stuck.any():
+                to_step[stuck], to_flag[stuck] = self.guess(boards[stuck])
+        return rounds
+
+
+class VectorSetAgent(VectorSimpleAgent):
+    """
+    Extends VectorSimpleAgent with the rule of SetAgent.pairwise, used on boards where primitive finds nothing.
+    """
+
+    def pairwise(self, boards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return pairwise(self.batch.stepped[boards], self.batch.flagged[boards], self.batch.values(boards))
+
+    def deduce(self, boards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        to_step, to_flag = self.primitive(boards)
+        stuck = ~(to_step | to_flag).any(axis=(1, 2))
+        if stuck.any():
+            to_step[stuck], to_flag[stuck] = self.pairwise(boards[stuck])
+        return to_step, to_flag
+
+
+# the rules themselves only look at what's visible, so they work on any stack of boards or part of a board,
+# with cells beyond the edge of the arrays read as neither stepped on nor unknown
+
+
+def primitive(stepped: np.ndarray, flagged: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    unknown = ~(stepped | flagged)
+    unknown_count = neighbour_sum(unknown)
+    remaining = values - neighbour_sum(flagged)
+    searchable = stepped & (unknown_count > 0)
+    to_flag = neighbour_sum(searchable & (remaining == unknown_count)) > 0
+    to_step = neighbour_sum(searchable & (remaining == 0)) > 0
+    return to_step & unknown, to_flag & unknown
+
+
+def pairwise(stepped: np.ndarray, flagged: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    unknown = ~(stepped | flagged)
+    # mines left to find around each stepped on cell
+    remaining = np.where(stepped, values - neighbour_sum(flagged), 0)
+    to_step = np.zeros_like(unknown)
+    to_flag = np.zeros_like(unknown)
+    for row, col in PAIR_OFFSETS:
+        # a is each cell and b the cell at the offset from it, we only check one direction
+        # of SetAgent.pairwise's rule here as the opposite offset covers the other
+        b_neighbours = {(row + r, col + c) for r, c in OFFSETS}
+        a_only = tuple(set(OFFSETS) - b_neighbours)
+        b_only = tuple(b_neighbours - set(OFFSETS) - {(0, 0)})
+        a_unknown = offset_sum(unknown, a_only)
+        b_unknown = offset_sum(unknown, b_only)
+        pair = stepped & shifted(stepped, row, col) & (a_unknown + b_unknown > 0)
+        rule = pair & (remaining - shifted(remaining, row, col) == a_unknown)
+        if not rule.any():
+            continue
+        for r, c in a_only:
+            to_flag |= shifted(rule, -r, -c)
+        for r, c in b_only:
+            to_step |= shifted(rule, -r, -c)
+    return to_step & unknown, to_flag & unknown
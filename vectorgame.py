@@ -0,0 +1,112 @@
+import numpy as np
+from itertools import product as iter_prod
+
+
+# every cell within one step of another, besides the cell itself
+OFFSETS = tuple((row, col) for row, col in iter_prod(range(-1, 2), range(-1, 2)) if row or col)
+
+
+class MinesweeperBatch:
+    """
+    Many games of minesweeper of the same size played in lockstep.
+    State is held as arrays of shape (boards, rows, columns), and moves are boolean masks of the same shape.
+    """
+
+    def __init__(self, boards: int, rows: int, columns: int, mines: int, seed=None, first_safe=False):
+        self.mines: np.ndarray = None
+        self.counts: np.ndarray = None
+        self.stepped: np.ndarray = None
+        self.flagged: np.ndarray = None
+        self.lost: np.ndarray = None
+        self._ignore_mine: np.ndarray = None
+        self.board_count = boards
+        self.row_count = rows
+        self.col_count = columns
+        self.mine_count = mines
+        self.first_safe = first_safe
+        self.random = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self):
+        # the first mine_count cells of a random ordering of each board
+        order = self.random.random((self.board_count, self.row_count * self.col_count)).argsort(axis=1)
+        self.mines = np.zeros((self.board_count, self.row_count * self.col_count), dtype=bool)
+        np.put_along_axis(self.mines, order[:, :self.mine_count], True, axis=1)
+        self.mines = self.mines.reshape((self.board_count, self.row_count, self.col_count))
+        self.counts = neighbour_sum(self.mines)
+        self.stepped = np.zeros_like(self.mines)
+        self.flagged = np.zeros_like(self.mines)
+        self.lost = np.zeros(self.board_count, dtype=bool)
+        self._ignore_mine = np.full(self.board_count, self.first_safe)
+
+    def unknown(self, boards: np.ndarray = None) -> np.ndarray:
+        if boards is None:
+            return ~(self.stepped | self.flagged)
+        return ~(self.stepped[boards] | self.flagged[boards])
+
+    def finished(self) -> np.ndarray:
+        return self.lost | ~self.unknown().any(axis=(1, 2))
+
+    def winning_state(self) -> np.ndarray:
+        return ~self.lost & (self.mines_remaining() == 0)
+
+    def step(self, cells: np.ndarray, boards: np.ndarray = None):
+        """
+        Steps on the given cells, where boards optionally picks out which boards the masks in cells belong to.
+        """
+        boards = np.arange(self.board_count) if boards is None else boards
+        cells = cells & ~self.stepped[boards]
+        stepping = cells.any(axis=(1, 2))
+        for index in np.flatnonzero(stepping & self._ignore_mine[boards]):
+            board = boards[index]
+            # first-safe boards only ever step on a single cell with their first move
+            for cell in zip(*np.nonzero(cells[index] & self.mines[board])):
+                free = np.flatnonzero(~(self.stepped[board] | cells[index] | self.mines[board]))
+                new_mine = np.unravel_index(self.random.choice(free), self.mines[board].shape)
+                self.mines[board][cell] = False
+                self.mines[board][new_mine] = True
+                self.counts[board] = neighbour_sum(self.mines[board])
+        self._ignore_mine[boards] &= ~stepping
+        self.stepped[boards] |= cells
+        self.lost[boards] |= (cells & self.mines[boards]).any(axis=(1, 2))
+
+    def flag(self, cells: np.ndarray, boards: np.ndarray = None):
+        boards = np.arange(self.board_count) if boards is None else boards
+        self.flagged[boards] |= cells & ~self.stepped[boards]
+
+    def mines_remaining(self, boards: np.ndarray = None) -> np.ndarray:
+        if boards is None:
+            return (self.mines & ~self.flagged).sum(axis=(1, 2))
+        return (self.mines[boards] & ~self.flagged[boards]).sum(axis=(1, 2))
+
+    def tiles_remaining(self, boards: np.ndarray = None) -> np.ndarray:
+        return self.unknown(boards).sum(axis=(1, 2))
+
+    def values(self, boards: np.ndarray = None) -> np.ndarray:
+        # what the player can see, so mine counts of cells which haven't been stepped on read as zero
+        if boards is None:
+            return np.where(self.stepped, self.counts, 0)
+        return np.where(self.stepped[boards], self.counts[boards], 0)
+
+
+def shifted(a: np.ndarray, row: int, col: int) -> np.ndarray:
+    """
+    Shifts the last two axes of a so that shifted(a, row, col)[..., r, c] == a[..., r + row, c + col],
+    with anything beyond the edge of the board reading as zero.
+    """
+    result = np.zeros_like(a)
+    rows, cols = a.shape[-2:]
+    result[..., max(-row, 0):rows - max(row, 0), max(-col, 0):cols - max(col, 0)] = \
+        a[..., max(row, 0):rows - max(-row, 0), max(col, 0):cols - max(-col, 0)]
+    return result
+
+
+def offset_sum(a: np.ndarray, offsets) -> np.ndarray:
+    total = np.zeros(a.shape, dtype=np.int8)
+    for row, col in offsets:
+        total += shifted(a, row, col)
+    return total
+
+
+def neighbour_sum(a: np.ndarray) -> np.ndarray:
+    return offset_sum(a, OFFSETS)